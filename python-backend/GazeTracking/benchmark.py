@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import cv2
+import numpy as np
+from gaze_tracking import GazeTracking
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frame_source import open_source
+
+# usage: python benchmark.py recorded_video.mp4 [max_frames]
+
+
+def read_frames(video_path, max_frames=600, size=(480, 320)):
+    """Decodes the video up front, through the same source as the server, so decoding does not count in the gaze timings"""
+    source = open_source(video_path, realtime=False)
+    if not source.open():
+        raise IOError(f"Could not open {video_path}")
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = source.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, size))
+    source.release()
+    return frames
+
+
+def run(gaze, frames):
+    ratios = []
+    start = time.perf_counter()
+    for frame in frames:
+        gaze.refresh(frame)
+        ratios.append(gaze.horizontal_ratio())
+    elapsed = time.perf_counter() - start
+    return len(frames) / elapsed, ratios
+
+
+def compare(frames):
+    predictor = GazeTracking.load_predictor()
+    engines = {
+        "full-frame detection": GazeTracking(predictor=predictor, detection_width=None, redetect_interval=1),
+        "downscaled detection": GazeTracking(predictor=predictor, redetect_interval=1),
+        "downscaled + tracking": GazeTracking(predictor=predictor),
+    }
+
+    baseline = None
+    for name, gaze in engines.items():
+        fps, ratios = run(gaze, frames)
+        located = np.array([ratio is not None for ratio in ratios])
+        line = f"{name:24s} {fps:7.1f} fps, pupils located on {located.mean():.1%} of frames, " \
+               f"{gaze.detections} detections / {gaze.tracked_frames} tracked frames"
+
+        if baseline is None:
+            baseline = ratios
+        else:
+            both = [(a, b) for a, b in zip(baseline, ratios) if a is not None and b is not None]
+            if both:
+                difference = np.abs(np.subtract(*zip(*both)))
+                line += f", horizontal ratio differs from full-frame by {difference.mean():.3f} on average"
+        print(line)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python benchmark.py recorded_video.mp4 [max_frames]")
+        sys.exit(1)
+
+    frames = read_frames(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 600)
+    print(f"{len(frames)} frames from {sys.argv[1]}")
+    compare(frames)
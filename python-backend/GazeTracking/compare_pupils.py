@@ -0,0 +1,104 @@
+import os
+import sys
+import time
+import cv2
+import numpy as np
+from gaze_tracking import GazeTracking
+from gaze_tracking.pupil import Pupil
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frame_source import open_source
+
+# usage:
+#   python compare_pupils.py record recorded_video.mp4 eye_crops/   saves the isolated eyes of a video
+#   python compare_pupils.py compare eye_crops/                      compares the pupil localizers on them
+
+
+def record_eye_crops(video_path, output_dir, max_frames=1000):
+    """Saves every isolated eye as <frame>_<side>_<threshold>.png, the threshold being the calibrated one"""
+    os.makedirs(output_dir, exist_ok=True)
+    gaze = GazeTracking()
+    # read like the server does, without pacing the file to its frame rate
+    source = open_source(video_path, realtime=False)
+    if not source.open():
+        raise IOError(f"Could not open {video_path}")
+    saved = 0
+    for frame_number in range(max_frames):
+        ret, frame = source.read()
+        if not ret:
+            break
+        gaze.refresh(frame)
+
+        for side, eye in enumerate((gaze.eye_left, gaze.eye_right)):
+            if eye is None or eye.pupil is None or eye.frame.size == 0:
+                continue
+            cv2.imwrite(os.path.join(output_dir, f"{frame_number:05d}_{side}_{eye.pupil.threshold}.png"), eye.frame)
+            saved += 1
+    source.release()
+    print(f"saved {saved} eye crops to {output_dir}")
+
+
+def load_eye_crops(crops_dir):
+    """Returns {side: [(crop, threshold), ...]} in frame order"""
+    crops = {0: [], 1: []}
+    for name in sorted(os.listdir(crops_dir)):
+        if not name.endswith(".png"):
+            continue
+        _, side, threshold = os.path.splitext(name)[0].split("_")
+        crop = cv2.imread(os.path.join(crops_dir, name), cv2.IMREAD_GRAYSCALE)
+        crops[int(side)].append((crop, int(threshold)))
+    return crops
+
+
+def horizontal_ratio(pupil, crop):
+    """Same formula as GazeTracking.horizontal_ratio, for one eye"""
+    return pupil.x / ((crop.shape[1] / 2) * 2 - 10)
+
+
+def evaluate(method, crops):
+    latencies = []
+    centroids = []
+    ratios = []
+    for crop, threshold in crops:
+        start = time.perf_counter()
+        pupil = Pupil(crop, threshold, method)
+        latencies.append(time.perf_counter() - start)
+        located = pupil.x is not None
+        centroids.append((pupil.x, pupil.y) if located else None)
+        ratios.append(horizontal_ratio(pupil, crop) if located else np.nan)
+    return np.asarray(latencies) * 1000, centroids, np.asarray(ratios)
+
+
+def compare(crops_dir):
+    for side, crops in load_eye_crops(crops_dir).items():
+        if not crops:
+            continue
+        print(f"{'left' if side == 0 else 'right'} eye, {len(crops)} crops")
+
+        reference = None
+        for method in Pupil.METHODS:
+            latencies, centroids, ratios = evaluate(method, crops)
+            located = ~np.isnan(ratios)
+            # frame to frame jitter of the ratio, lower is more stable
+            jitter = np.nanmean(np.abs(np.diff(ratios))) if located.sum() > 1 else np.nan
+            line = f"  {method:10s} {latencies.mean():.3f} ms mean, {np.percentile(latencies, 95):.3f} ms p95, " \
+                   f"located {located.mean():.1%}, horizontal ratio jitter {jitter:.4f}"
+
+            if reference is None:
+                reference = centroids
+            else:
+                distances = [np.hypot(a[0] - b[0], a[1] - b[1]) for a, b in zip(reference, centroids)
+                             if a is not None and b is not None]
+                if distances:
+                    line += f", {np.mean(distances):.2f} px from contours"
+            print(line)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "record":
+        record_eye_crops(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) == 3 and sys.argv[1] == "compare":
+        compare(sys.argv[2])
+    else:
+        print("usage: python compare_pupils.py record video.mp4 eye_crops/ | compare eye_crops/")
+        sys.exit(1)
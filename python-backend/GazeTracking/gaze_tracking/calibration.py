@@ -1,5 +1,8 @@
 from __future__ import division
+import os
+import json
 import cv2
+import numpy as np
 from .pupil import Pupil
 
 
@@ -9,14 +12,18 @@ class Calibration(object):
     best binarization threshold value for the person and the webcam.
     """
 
+    THRESHOLDS = np.arange(5, 100, 5)
+    AVERAGE_IRIS_SIZE = 0.48
+
     def __init__(self):
         self.nb_frames = 20
-        self.thresholds_left = []
-        self.thresholds_right = []
+        # running sum and count of the best thresholds found, per side
+        self.threshold_sums = [0, 0]
+        self.threshold_counts = [0, 0]
 
     def is_complete(self):
         """Returns true if the calibration is completed"""
-        return len(self.thresholds_left) >= self.nb_frames and len(self.thresholds_right) >= self.nb_frames
+        return min(self.threshold_counts) >= self.nb_frames
 
     def threshold(self, side):
         """Returns the threshold value for the given eye.
@@ -24,10 +31,8 @@ class Calibration(object):
         Argument:
             side: Indicates whether it's the left eye (0) or the right eye (1)
         """
-        if side == 0:
-            return int(sum(self.thresholds_left) / len(self.thresholds_left))
-        elif side == 1:
-            return int(sum(self.thresholds_right) / len(self.thresholds_right))
+        if side in (0, 1) and self.threshold_counts[side]:
+            return int(self.threshold_sums[side] / self.threshold_counts[side])
 
     @staticmethod
     def iris_size(frame):
@@ -43,6 +48,21 @@ class Calibration(object):
         nb_blacks = nb_pixels - cv2.countNonZero(frame)
         return nb_blacks / nb_pixels
 
+    @staticmethod
+    def iris_sizes(filtered_frame, thresholds):
+        """Returns the iris size of every threshold at once, from the cumulative
+        histogram of the filtered eye frame: binarizing at t keeps the pixels <= t black.
+
+        Arguments:
+            filtered_frame (numpy.ndarray): Eye frame after Pupil.filter_eye
+            thresholds (numpy.ndarray): Threshold values to evaluate
+        """
+        frame = filtered_frame[5:-5, 5:-5]
+        if frame.size == 0:
+            return None
+        blacks = np.cumsum(np.bincount(frame.ravel(), minlength=256))
+        return blacks[thresholds] / frame.size
+
     @staticmethod
     def find_best_threshold(eye_frame):
         """Calculates the optimal threshold to binarize the
@@ -51,15 +71,12 @@ class Calibration(object):
         Argument:
             eye_frame (numpy.ndarray): Frame of the eye to be analyzed
         """
-        average_iris_size = 0.48
-        trials = {}
-
-        for threshold in range(5, 100, 5):
-            iris_frame = Pupil.image_processing(eye_frame, threshold)
-            trials[threshold] = Calibration.iris_size(iris_frame)
-
-        best_threshold, iris_size = min(trials.items(), key=(lambda p: abs(p[1] - average_iris_size)))
-        return best_threshold
+        if eye_frame.size == 0:
+            return None
+        sizes = Calibration.iris_sizes(Pupil.filter_eye(eye_frame), Calibration.THRESHOLDS)
+        if sizes is None:
+            return None
+        return int(Calibration.THRESHOLDS[np.argmin(np.abs(sizes - Calibration.AVERAGE_IRIS_SIZE))])
 
     def evaluate(self, eye_frame, side):
         """Improves calibration by taking into consideration the
@@ -71,7 +88,34 @@ class Calibration(object):
         """
         threshold = self.find_best_threshold(eye_frame)
 
-        if side == 0:
-            self.thresholds_left.append(threshold)
-        elif side == 1:
-            self.thresholds_right.append(threshold)
+        if threshold is not None and side in (0, 1):
+            self.threshold_sums[side] += threshold
+            self.threshold_counts[side] += 1
+
+    def save(self, path):
+        """Saves the calibration, so a returning user can skip the warm-up frames"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as file:
+            json.dump({"nb_frames": self.nb_frames, "sums": self.threshold_sums, "counts": self.threshold_counts}, file)
+
+    def load(self, path):
+        """Loads a calibration saved with save(), returns False if there is none
+        or it cannot be read, leaving the calibration to warm up as usual"""
+        try:
+            with open(path) as file:
+                saved = json.load(file)
+            nb_frames = int(saved["nb_frames"])
+            sums = [int(value) for value in saved["sums"]]
+            counts = [int(value) for value in saved["counts"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+
+        if len(sums) != 2 or len(counts) != 2 or min(counts) <= 0:
+            return False
+
+        self.nb_frames = nb_frames
+        self.threshold_sums = sums
+        self.threshold_counts = counts
+        return True
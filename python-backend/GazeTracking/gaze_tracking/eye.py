@@ -4,6 +4,26 @@ import cv2
 from .pupil import Pupil
 
 
+class EyeScratch(object):
+    """
+    Reusable buffers for isolating one eye. They grow to the largest eye
+    crop seen and are then reused, so isolating an eye allocates nothing.
+    Crops taken from them are only valid until the next isolation.
+    """
+
+    def __init__(self):
+        self._eye = np.empty(0, np.uint8)
+        self._mask = np.empty(0, np.uint8)
+
+    def buffers(self, height, width):
+        """Returns contiguous (eye, mask) arrays of the given shape"""
+        size = height * width
+        if size > self._eye.size:
+            self._eye = np.empty(size, np.uint8)
+            self._mask = np.empty(size, np.uint8)
+        return self._eye[:size].reshape(height, width), self._mask[:size].reshape(height, width)
+
+
 class Eye(object):
     """
     This class creates a new frame to isolate the eye and
@@ -13,12 +33,14 @@ class Eye(object):
     LEFT_EYE_POINTS = [36, 37, 38, 39, 40, 41]
     RIGHT_EYE_POINTS = [42, 43, 44, 45, 46, 47]
 
-    def __init__(self, original_frame, landmarks, side, calibration):
+    def __init__(self, original_frame, landmarks, side, calibration, scratch=None, pupil_method="contours"):
         self.frame = None
         self.origin = None
         self.center = None
         self.pupil = None
         self.landmark_points = None
+        self._scratch = scratch if scratch is not None else EyeScratch()
+        self._pupil_method = pupil_method
 
         self._analyze(original_frame, landmarks, side, calibration)
 
@@ -46,21 +68,21 @@ class Eye(object):
         region = region.astype(np.int32)
         self.landmark_points = region
 
-        # Applying a mask to get only the eye
-        height, width = frame.shape[:2]
-        black_frame = np.zeros((height, width), np.uint8)
-        mask = np.full((height, width), 255, np.uint8)
-        cv2.fillPoly(mask, [region], (0, 0, 0))
-        eye = cv2.bitwise_not(black_frame, frame.copy(), mask=mask)
-
-        # Cropping on the eye
+        # Cropping on the eye, clipped to the frame
         margin = 5
-        min_x = np.min(region[:, 0]) - margin
-        max_x = np.max(region[:, 0]) + margin
-        min_y = np.min(region[:, 1]) - margin
-        max_y = np.max(region[:, 1]) + margin
-
-        self.frame = eye[min_y:max_y, min_x:max_x]
+        height, width = frame.shape[:2]
+        min_x = max(int(np.min(region[:, 0])) - margin, 0)
+        max_x = min(int(np.max(region[:, 0])) + margin, width)
+        min_y = max(int(np.min(region[:, 1])) - margin, 0)
+        max_y = min(int(np.max(region[:, 1])) + margin, height)
+
+        # Applying a mask to get only the eye, everything outside the polygon becomes white
+        eye, mask = self._scratch.buffers(max(max_y - min_y, 0), max(max_x - min_x, 0))
+        mask.fill(255)
+        cv2.fillPoly(mask, [region - np.array([min_x, min_y], np.int32)], (0, 0, 0))
+        cv2.bitwise_or(frame[min_y:max_y, min_x:max_x], mask, dst=eye)
+
+        self.frame = eye
         self.origin = (min_x, min_y)
 
         height, width = self.frame.shape[:2]
@@ -116,4 +138,5 @@ class Eye(object):
             calibration.evaluate(self.frame, side)
 
         threshold = calibration.threshold(side)
-        self.pupil = Pupil(self.frame, threshold)
+        if threshold is not None:
+            self.pupil = Pupil(self.frame, threshold, self._pupil_method)
@@ -2,8 +2,9 @@ from __future__ import division
 import os
 import cv2
 import dlib
-from .eye import Eye
+from .eye import Eye, EyeScratch
 from .calibration import Calibration
+from .pupil import Pupil
 
 
 class GazeTracking(object):
@@ -11,21 +12,52 @@ class GazeTracking(object):
     This class tracks the user's gaze.
     It provides useful information like the position of the eyes
     and pupils and allows to know if the eyes are open or closed
+
+    The face is detected on a copy of the frame downscaled to at most
+    detection_width pixels wide, then followed with a correlation tracker;
+    the detector runs again every redetect_interval frames or when the
+    tracker loses the face. detection_width=None and redetect_interval=1
+    detect on every full frame. pupil_method picks the pupil localizer,
+    one of Pupil.METHODS.
     """
 
-    def __init__(self):
+    def __init__(self, predictor=None, detection_width=320, redetect_interval=10, min_tracking_quality=7.0,
+                 pupil_method="contours"):
+        if pupil_method not in Pupil.METHODS:
+            raise ValueError(f"unknown pupil method {pupil_method!r}, expected one of {Pupil.METHODS}")
+
         self.frame = None
+        self.gray = None
+        self.face = None
         self.eye_left = None
         self.eye_right = None
         self.calibration = Calibration()
+        # one set of eye isolation buffers per side, reused on every frame
+        self._eye_scratch = (EyeScratch(), EyeScratch())
+        self.detection_width = detection_width
+        self.redetect_interval = redetect_interval
+        self.min_tracking_quality = min_tracking_quality
+        self.pupil_method = pupil_method
+        self.detections = 0
+        self.tracked_frames = 0
 
         # _face_detector is used to detect faces
         self._face_detector = dlib.get_frontal_face_detector()
 
-        # _predictor is used to get facial landmarks of a given face
+        # _tracker follows the face between two detections
+        self._tracker = dlib.correlation_tracker()
+        self._frames_since_detection = None
+
+        # _predictor is used to get facial landmarks of a given face,
+        # it can be shared by several trackers to load the model only once
+        self._predictor = predictor if predictor is not None else self.load_predictor()
+
+    @staticmethod
+    def load_predictor():
+        """Loads the 68 facial landmarks model shipped next to this file"""
         cwd = os.path.abspath(os.path.dirname(__file__))
         model_path = os.path.abspath(os.path.join(cwd, "shape_predictor_68_face_landmarks.dat"))
-        self._predictor = dlib.shape_predictor(model_path)
+        return dlib.shape_predictor(model_path)
 
     @property
     def pupils_located(self):
@@ -39,27 +71,78 @@ class GazeTracking(object):
         except Exception:
             return False
 
-    def _analyze(self):
-        """Detects the face and initialize Eye objects"""
-        frame = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
+    @property
+    def face_box(self):
+        """Returns the (x1, y1, x2, y2) box of the analyzed face clipped to the frame, or None"""
+        if self.face is None:
+            return None
+
+        height, width = self.frame.shape[:2]
+        x1, y1 = max(self.face.left(), 0), max(self.face.top(), 0)
+        x2, y2 = min(self.face.right(), width), min(self.face.bottom(), height)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return (x1, y1, x2, y2)
+
+    def _detect_face(self, frame):
+        """Runs the HOG detector on a downscaled frame and maps the first face back to frame coordinates"""
+        self.detections += 1
+        self._frames_since_detection = 0
+        width = frame.shape[1]
+        scale = 1.0
+        if self.detection_width and width > self.detection_width:
+            scale = self.detection_width / width
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
         faces = self._face_detector(frame)
+        if len(faces) == 0:
+            return None
+
+        face = faces[0]
+        return dlib.rectangle(int(face.left() / scale), int(face.top() / scale),
+                              int(face.right() / scale), int(face.bottom() / scale))
+
+    def _locate_face(self, frame):
+        """Returns the face box, from the tracker when it is still reliable, else from the detector"""
+        if self._frames_since_detection is not None and self._frames_since_detection + 1 < self.redetect_interval:
+            quality = self._tracker.update(frame)
+            if quality >= self.min_tracking_quality:
+                self._frames_since_detection += 1
+                self.tracked_frames += 1
+                position = self._tracker.get_position()
+                return dlib.rectangle(int(position.left()), int(position.top()),
+                                      int(position.right()), int(position.bottom()))
+
+        face = self._detect_face(frame)
+        if face is None:
+            self._frames_since_detection = None
+        elif self.redetect_interval > 1:
+            self._tracker.start_track(frame, face)
+        return face
 
-        try:
-            landmarks = self._predictor(frame, faces[0])
-            self.eye_left = Eye(frame, landmarks, 0, self.calibration)
-            self.eye_right = Eye(frame, landmarks, 1, self.calibration)
+    def _analyze(self):
+        """Detects the face and initialize Eye objects"""
+        frame = self.gray
+        self.face = self._locate_face(frame)
 
-        except IndexError:
+        if self.face is None:
             self.eye_left = None
             self.eye_right = None
+            return
+
+        landmarks = self._predictor(frame, self.face)
+        self.eye_left = Eye(frame, landmarks, 0, self.calibration, self._eye_scratch[0], self.pupil_method)
+        self.eye_right = Eye(frame, landmarks, 1, self.calibration, self._eye_scratch[1], self.pupil_method)
 
-    def refresh(self, frame):
+    def refresh(self, frame, gray=None):
         """Refreshes the frame and analyzes it.
 
         Arguments:
             frame (numpy.ndarray): The frame to analyze
+            gray (numpy.ndarray): The frame already converted to grayscale, if another stage has it
         """
         self.frame = frame
+        self.gray = gray if gray is not None else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         self._analyze()
 
     def pupil_left_coords(self):
@@ -6,16 +6,40 @@ class Pupil(object):
     """
     This class detects the iris of an eye and estimates
     the position of the pupil
+
+    The centroid is found with one of METHODS:
+    "contours" takes the second largest contour (the original method),
+    "components" takes the largest connected blob of dark pixels and
+    "projection" averages the row and column projections of the dark pixels.
     """
 
-    def __init__(self, eye_frame, threshold):
+    METHODS = ("contours", "components", "projection")
+
+    def __init__(self, eye_frame, threshold, method="contours"):
+        if method not in self.METHODS:
+            raise ValueError(f"unknown pupil method {method!r}, expected one of {self.METHODS}")
+
         self.iris_frame = None
         self.threshold = threshold
+        self.method = method
         self.x = None
         self.y = None
 
         self.detect_iris(eye_frame)
 
+    KERNEL = np.ones((3, 3), np.uint8)
+
+    @staticmethod
+    def filter_eye(eye_frame):
+        """Smooths the eye frame and erodes it, the part of image_processing
+        that does not depend on the threshold
+
+        Arguments:
+            eye_frame (numpy.ndarray): Frame containing an eye and nothing else
+        """
+        new_frame = cv2.bilateralFilter(eye_frame, 10, 15, 15)
+        return cv2.erode(new_frame, Pupil.KERNEL, iterations=3)
+
     @staticmethod
     def image_processing(eye_frame, threshold):
         """Performs operations on the eye frame to isolate the iris
@@ -27,9 +51,7 @@ class Pupil(object):
         Returns:
             A frame with a single element representing the iris
         """
-        kernel = np.ones((3, 3), np.uint8)
-        new_frame = cv2.bilateralFilter(eye_frame, 10, 15, 15)
-        new_frame = cv2.erode(new_frame, kernel, iterations=3)
+        new_frame = Pupil.filter_eye(eye_frame)
         new_frame = cv2.threshold(new_frame, threshold, 255, cv2.THRESH_BINARY)[1]
 
         return new_frame
@@ -43,12 +65,50 @@ class Pupil(object):
         """
         self.iris_frame = self.image_processing(eye_frame, self.threshold)
 
-        contours, _ = cv2.findContours(self.iris_frame, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)[-2:]
+        if self.method == "components":
+            centroid = self.components_centroid(self.iris_frame)
+        elif self.method == "projection":
+            centroid = self.projection_centroid(self.iris_frame)
+        else:
+            centroid = self.contours_centroid(self.iris_frame)
+
+        if centroid is not None:
+            self.x, self.y = centroid
+
+    @staticmethod
+    def contours_centroid(iris_frame):
+        """Centroid of the second largest contour of the binarized frame"""
+        contours, _ = cv2.findContours(iris_frame, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)[-2:]
         contours = sorted(contours, key=cv2.contourArea)
 
         try:
             moments = cv2.moments(contours[-2])
-            self.x = int(moments['m10'] / moments['m00'])
-            self.y = int(moments['m01'] / moments['m00'])
+            return int(moments['m10'] / moments['m00']), int(moments['m01'] / moments['m00'])
         except (IndexError, ZeroDivisionError):
-            pass
+            return None
+
+    @staticmethod
+    def components_centroid(iris_frame):
+        """Centroid of the largest connected component of black (iris) pixels"""
+        count, _, stats, centroids = cv2.connectedComponentsWithStats(cv2.bitwise_not(iris_frame), connectivity=8)
+        if count < 2:
+            return None
+
+        # label 0 is the white background
+        largest = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+        x, y = centroids[largest]
+        return int(x), int(y)
+
+    @staticmethod
+    def projection_centroid(iris_frame):
+        """Centroid of all the black (iris) pixels from the row and column projections"""
+        dark = iris_frame == 0
+        columns = dark.sum(axis=0)
+        total = columns.sum()
+        if total == 0:
+            return None
+
+        rows = dark.sum(axis=1)
+        x = np.dot(columns, np.arange(len(columns))) / total
+        y = np.dot(rows, np.arange(len(rows))) / total
+        return int(x), int(y)
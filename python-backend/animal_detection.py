@@ -0,0 +1,136 @@
+import time
+import cv2
+
+
+def animal_class_ids(class_names, animals):
+    """Returns the YOLO class ids whose name is one of animals, class_names maps id -> name"""
+    return sorted(class_id for class_id, name in class_names.items() if name in animals)
+
+
+class TrackedAnimal(object):
+    def __init__(self, label, confidence, box, template):
+        self.label = label
+        self.confidence = confidence
+        self.box = box
+        self.template = template
+
+
+class AnimalDetector(object):
+    """
+    This class runs YOLO on one frame every `stride` frames, or sooner when
+    the scene changed, and follows the detected animals with template
+    matching on the frames in between. Only animal classes are requested
+    from the predictor so the other boxes are never post-processed.
+    """
+
+    def __init__(self, detect, class_names, animals, stride=5, confidence=0.25,
+                 scene_change_threshold=12.0, scene_size=(64, 48), search_margin=24, min_match_score=0.6):
+        self.detect = detect
+        self.class_names = class_names
+        self.class_ids = animal_class_ids(class_names, animals)
+        self.stride = stride
+        self.confidence = confidence
+        self.scene_change_threshold = scene_change_threshold
+        self.scene_size = scene_size
+        self.search_margin = search_margin
+        self.min_match_score = min_match_score
+
+        self.tracks = []
+        self.frames = 0
+        self.detections = 0
+        self.scene_changes = 0
+        self.detect_time = 0.0
+        self.track_time = 0.0
+        self._frames_since_detection = 0
+        self._reference_scene = None
+        self._started_at = None
+
+    def _scene_changed(self, scene):
+        if self._reference_scene is None:
+            return True
+        return cv2.absdiff(scene, self._reference_scene).mean() > self.scene_change_threshold
+
+    def _run_detection(self, frame, gray):
+        start = time.perf_counter()
+        results = self.detect(frame, conf=self.confidence, classes=self.class_ids, verbose=False)
+        boxes = results.boxes
+        class_ids = boxes.cls.cpu().numpy().astype(int)
+        confidences = boxes.conf.cpu().numpy()
+        coordinates = boxes.xyxy.cpu().numpy().astype(int)
+
+        height, width = gray.shape
+        tracks = []
+        for class_id, confidence, (x1, y1, x2, y2) in zip(class_ids, confidences, coordinates):
+            x1, y1 = max(x1, 0), max(y1, 0)
+            x2, y2 = min(x2, width), min(y2, height)
+            if x2 - x1 < 2 or y2 - y1 < 2:
+                continue
+            tracks.append(TrackedAnimal(self.class_names[class_id], float(confidence), (x1, y1, x2, y2),
+                                        gray[y1:y2, x1:x2].copy()))
+
+        self.tracks = tracks
+        self.detections += 1
+        self.detect_time += time.perf_counter() - start
+
+    def _track(self, gray):
+        start = time.perf_counter()
+        height, width = gray.shape
+        tracks = []
+        for track in self.tracks:
+            x1, y1, x2, y2 = track.box
+            left, top = max(x1 - self.search_margin, 0), max(y1 - self.search_margin, 0)
+            right, bottom = min(x2 + self.search_margin, width), min(y2 + self.search_margin, height)
+            window = gray[top:bottom, left:right]
+            if window.shape[0] < track.template.shape[0] or window.shape[1] < track.template.shape[1]:
+                continue
+
+            scores = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (dx, dy) = cv2.minMaxLoc(scores)
+            if score < self.min_match_score:
+                # lost it, the animal left the frame or changed too much
+                continue
+
+            track.box = (left + dx, top + dy, left + dx + (x2 - x1), top + dy + (y2 - y1))
+            tracks.append(track)
+
+        self.tracks = tracks
+        self.track_time += time.perf_counter() - start
+
+    def process(self, frame, gray=None):
+        """Returns the (label, confidence, box) of the animals currently in frame"""
+        if self._started_at is None:
+            self._started_at = time.perf_counter()
+        self.frames += 1
+
+        if gray is None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        scene = cv2.resize(gray, self.scene_size, interpolation=cv2.INTER_AREA)
+        scene_changed = self._scene_changed(scene)
+
+        if scene_changed or self._frames_since_detection + 1 >= self.stride:
+            if scene_changed and self._reference_scene is not None:
+                self.scene_changes += 1
+            self._run_detection(frame, gray)
+            self._reference_scene = scene
+            self._frames_since_detection = 0
+        else:
+            self._track(gray)
+            self._frames_since_detection += 1
+
+        return [(track.label, track.confidence, track.box) for track in self.tracks]
+
+    def report(self):
+        """Returns the detection rate and the detection time saved by tracking in between"""
+        elapsed = time.perf_counter() - self._started_at if self._started_at else 0.0
+        mean_detect = self.detect_time / self.detections if self.detections else 0.0
+        tracked_frames = self.frames - self.detections
+        return {
+            "frames": self.frames,
+            "detections": self.detections,
+            "scene_changes": self.scene_changes,
+            "detections_per_s": round(self.detections / elapsed, 2) if elapsed else 0.0,
+            "mean_detect_ms": round(1000 * mean_detect, 2),
+            "mean_track_ms": round(1000 * self.track_time / tracked_frames, 2) if tracked_frames else 0.0,
+            # what running YOLO on the tracked frames would have cost, minus what tracking cost
+            "time_saved_s": round(tracked_frames * mean_detect - self.track_time, 2),
+        }
@@ -0,0 +1,110 @@
+import time
+import dlib
+from collections import Counter, deque
+from constants import models
+
+
+def box_iou(box_a, box_b):
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    top, bottom = max(box_a[0], box_b[0]), min(box_a[2], box_b[2])
+    left, right = max(box_a[3], box_b[3]), min(box_a[1], box_b[1])
+    intersection = max(0, bottom - top) * max(0, right - left)
+    area_a = (box_a[2] - box_a[0]) * (box_a[1] - box_a[3])
+    area_b = (box_b[2] - box_b[0]) * (box_b[1] - box_b[3])
+    union = area_a + area_b - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+class FaceAuthenticator(object):
+    """
+    This class authenticates a user over consecutive camera frames.
+    The face is detected once and then followed with a dlib correlation
+    tracker; it is only re-encoded when the box moves or the last encoding
+    gets too old, and a name is accepted only after it wins a vote over the
+    last `window` encodings.
+    """
+
+    def __init__(self, index, window=5, min_votes=3, max_encoding_age=0.5, min_iou=0.8,
+                 min_tracking_quality=7.0, tolerance=0.5, acceptance=0.75):
+        self.index = index
+        self.window = window
+        self.min_votes = min_votes
+        self.max_encoding_age = max_encoding_age
+        self.min_iou = min_iou
+        self.min_tracking_quality = min_tracking_quality
+        self.tolerance = tolerance
+        self.acceptance = acceptance
+
+        self.detections = 0
+        self.encodings = 0
+        self.frames = 0
+        self.reset()
+
+    def reset(self):
+        """Forgets the tracked face and the votes"""
+        self._tracker = None
+        self._encoded_box = None
+        self._encoded_at = 0.0
+        self._votes = deque(maxlen=self.window)
+
+    def _detect(self, image):
+        self.detections += 1
+        locations = models.get("face_recognition").face_locations(image)
+        if not locations:
+            self._tracker = None
+            return None
+
+        top, right, bottom, left = locations[0]
+        self._tracker = dlib.correlation_tracker()
+        self._tracker.start_track(image, dlib.rectangle(left, top, right, bottom))
+        return locations[0]
+
+    def _track(self, image):
+        """Returns the face box in this frame, re-detecting when the tracker loses it"""
+        if self._tracker is None:
+            return self._detect(image)
+
+        quality = self._tracker.update(image)
+        if quality < self.min_tracking_quality:
+            return self._detect(image)
+
+        position = self._tracker.get_position()
+        height, width = image.shape[:2]
+        top, bottom = max(0, int(position.top())), min(height, int(position.bottom()))
+        left, right = max(0, int(position.left())), min(width, int(position.right()))
+        if bottom <= top or right <= left:
+            return self._detect(image)
+        return (top, right, bottom, left)
+
+    def _needs_encoding(self, box, now):
+        if self._encoded_box is None or now - self._encoded_at >= self.max_encoding_age:
+            return True
+        return box_iou(box, self._encoded_box) < self.min_iou
+
+    def process(self, image):
+        """Feeds one frame, returns the authenticated name or None if not decided yet"""
+        self.frames += 1
+        box = self._track(image)
+        if box is None:
+            self._votes.clear()
+            self._encoded_box = None
+            return None
+
+        now = time.monotonic()
+        if not self._needs_encoding(box, now):
+            return None
+
+        self.encodings += 1
+        face_encs = models.get("face_recognition").face_encodings(image, [box])
+        self._encoded_box = box
+        self._encoded_at = now
+        if not face_encs:
+            return None
+
+        self._votes.append(self.index.match(face_encs[0], tolerance=self.tolerance, acceptance=self.acceptance))
+        ranking = Counter(vote for vote in self._votes if vote is not None).most_common(1)
+        if ranking and ranking[0][1] >= self.min_votes:
+            name = ranking[0][0]
+            self.reset()
+            return name
+        return None
@@ -0,0 +1,63 @@
+import time
+import numpy as np
+from rich import print
+from face_search import BruteForceSearch, IVFSearch
+
+# synthetic encodings roughly shaped like dlib's: different people ~0.9 apart, same person ~0.3
+IDENTITY_SPREAD = 0.056
+SAMPLE_NOISE = 0.02
+
+
+def make_synthetic_roster(n_identities, encodings_per_identity=2, dim=128, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0, IDENTITY_SPREAD, size=(n_identities, dim)).astype(np.float32)
+    labels = np.repeat(np.arange(n_identities), encodings_per_identity)
+    matrix = centers[labels] + rng.normal(0, SAMPLE_NOISE, size=(len(labels), dim)).astype(np.float32)
+    return centers, np.ascontiguousarray(matrix), labels
+
+
+def make_queries(centers, n_queries, seed=1):
+    rng = np.random.default_rng(seed)
+    identities = rng.integers(0, len(centers), size=n_queries)
+    queries = centers[identities] + rng.normal(0, SAMPLE_NOISE, size=(n_queries, centers.shape[1])).astype(np.float32)
+    return queries, identities
+
+
+def run_queries(search, queries, k):
+    results = []
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        rows, _ = search.search(query, k=k)
+        latencies.append(time.perf_counter() - start)
+        results.append(rows)
+    return results, np.asarray(latencies) * 1000
+
+
+def benchmark(n_identities, n_queries=200, k=10, n_probe=8):
+    centers, matrix, labels = make_synthetic_roster(n_identities)
+    queries, identities = make_queries(centers, n_queries)
+
+    brute = BruteForceSearch()
+    brute.build(matrix)
+    exact_results, brute_latencies = run_queries(brute, queries, k)
+
+    ivf = IVFSearch(n_probe=n_probe)
+    start = time.perf_counter()
+    ivf.build(matrix)
+    build_time = time.perf_counter() - start
+    ivf_results, ivf_latencies = run_queries(ivf, queries, k)
+
+    recall = np.mean([len(np.intersect1d(exact, approx)) / len(exact) for exact, approx in zip(exact_results, ivf_results)])
+    brute_accuracy = np.mean([labels[rows[0]] == identity for rows, identity in zip(exact_results, identities)])
+    ivf_accuracy = np.mean([len(rows) > 0 and labels[rows[0]] == identity for rows, identity in zip(ivf_results, identities)])
+
+    print(f"[bold]{n_identities} identities[/bold] ({len(matrix)} encodings)")
+    print(f"  brute: {brute_latencies.mean():.3f} ms mean, {np.percentile(brute_latencies, 95):.3f} ms p95, top-1 accuracy {brute_accuracy:.3f}")
+    print(f"  ivf:   {ivf_latencies.mean():.3f} ms mean, {np.percentile(ivf_latencies, 95):.3f} ms p95, top-1 accuracy {ivf_accuracy:.3f}, "
+          f"recall@{k} vs brute {recall:.3f} ({len(ivf.centroids)} lists, n_probe={n_probe}, built in {build_time:.1f} s)")
+
+
+if __name__ == "__main__":
+    for n_identities in (1_000, 10_000, 100_000):
+        benchmark(n_identities)
@@ -0,0 +1,83 @@
+import os
+import time
+import pickle
+import numpy as np
+from rich import print
+from types import SimpleNamespace
+from gesture_features import LandmarkFeatures, NUM_LANDMARKS, CompiledForest
+
+CLASSIFIER_FILE = "./classifier-new.p"
+
+
+def make_synthetic_hands(n_frames, seed=0):
+    """MediaPipe-like results: one hand of 21 landmarks with .x and .y per frame"""
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0.2, 0.8, size=(n_frames, NUM_LANDMARKS, 2))
+    return [[SimpleNamespace(landmark=[SimpleNamespace(x=x, y=y, z=0.0) for x, y in hand])] for hand in points]
+
+
+def legacy_features(multi_hand_landmarks):
+    """The per-landmark loop the server and create_dataset.py used before gesture_features"""
+    data_aux = []
+    x_ = []
+    y_ = []
+    for hand_landmarks in multi_hand_landmarks:
+        for i in range(len(hand_landmarks.landmark)):
+            x_.append(hand_landmarks.landmark[i].x)
+            y_.append(hand_landmarks.landmark[i].y)
+
+        for i in range(len(hand_landmarks.landmark)):
+            data_aux.append(hand_landmarks.landmark[i].x - min(x_))
+            data_aux.append(hand_landmarks.landmark[i].y - min(y_))
+    return data_aux
+
+
+def load_forest(frames):
+    if os.path.exists(CLASSIFIER_FILE):
+        with open(CLASSIFIER_FILE, "rb") as file:
+            return pickle.load(file)["classifier-new"]
+
+    from sklearn.ensemble import RandomForestClassifier
+    print(f"{CLASSIFIER_FILE} not found, training a forest on synthetic landmarks")
+    data = np.asarray([legacy_features(hands) for hands in frames])
+    labels = np.random.default_rng(1).integers(0, 6, size=len(data)).astype(str)
+    return RandomForestClassifier().fit(data, labels)
+
+
+def time_per_frame(function, frames):
+    latencies = []
+    results = []
+    for hands in frames:
+        start = time.perf_counter()
+        results.append(function(hands))
+        latencies.append(time.perf_counter() - start)
+    return results, np.asarray(latencies) * 1000
+
+
+def benchmark(n_frames=2000):
+    frames = make_synthetic_hands(n_frames)
+    forest = load_forest(frames)
+    compiled = CompiledForest(forest)
+    landmark_features = LandmarkFeatures(max_hands=1)
+
+    def before(hands):
+        return forest.predict([np.asarray(legacy_features(hands))])[0]
+
+    def after(hands):
+        return compiled.predict(landmark_features.extract(hands))[0]
+
+    before_results, before_latencies = time_per_frame(before, frames)
+    after_results, after_latencies = time_per_frame(after, frames)
+    _, legacy_feature_latencies = time_per_frame(legacy_features, frames)
+    _, feature_latencies = time_per_frame(landmark_features.extract, frames)
+
+    agreement = np.mean([a == b for a, b in zip(before_results, after_results)])
+    print(f"[bold]{n_frames} frames[/bold], forest of {len(forest.estimators_)} trees (max depth {compiled.max_depth})")
+    print(f"  features: {legacy_feature_latencies.mean():.4f} ms loop -> {feature_latencies.mean():.4f} ms LandmarkFeatures")
+    print(f"  before:   {before_latencies.mean():.3f} ms mean, {np.percentile(before_latencies, 95):.3f} ms p95 (loop + sklearn predict)")
+    print(f"  after:    {after_latencies.mean():.3f} ms mean, {np.percentile(after_latencies, 95):.3f} ms p95 (LandmarkFeatures + CompiledForest)")
+    print(f"  speed-up: {before_latencies.mean() / after_latencies.mean():.1f}x, predictions identical on {agreement:.1%} of frames")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,9 +1,53 @@
-import cv2
+from threading import Lock
+from frame_source import FrameSource, open_source
+
+# camera index, video file or image directory every part of the server reads frames from
+FRAME_SOURCE = 0
+
+_frame_sources = {}
+_claimed = set()
+_capture_subscription = None
+_lock = Lock()
+
+def get_frame_source(spec=None):
+    """Returns the shared frame source of spec (FRAME_SOURCE by default), opening it on first use
+    and reopening it if a failed read stopped it"""
+    spec = FRAME_SOURCE if spec is None else spec
+    with _lock:
+        if spec not in _frame_sources:
+            _frame_sources[spec] = FrameSource(open_source(spec))
+        return _frame_sources[spec].start()
+
+def claim_frame_source(spec=None):
+    """Subscribes a session to spec, returns None if another session already reads it.
+    Two sessions on the same camera would see the same person, so a source serves one session at a time."""
+    spec = FRAME_SOURCE if spec is None else spec
+    with _lock:
+        if spec in _claimed:
+            return None
+        _claimed.add(spec)
+    try:
+        return get_frame_source(spec).subscribe()
+    except Exception:
+        unclaim_frame_source(spec)
+        raise
+
+def unclaim_frame_source(spec=None):
+    spec = FRAME_SOURCE if spec is None else spec
+    with _lock:
+        _claimed.discard(spec)
 
 def capture_image():
-    cam = cv2.VideoCapture(0)
+    global _capture_subscription
+    if _capture_subscription is None:
+        _capture_subscription = get_frame_source().subscribe()
+    return _capture_subscription.read()
 
-    _, image= cam.read()
-    cam.release()
-    cv2.destroyAllWindows()
-    return _, image
\ No newline at end of file
+def release():
+    global _capture_subscription
+    with _lock:
+        for frame_source in _frame_sources.values():
+            frame_source.stop()
+        _frame_sources.clear()
+        _claimed.clear()
+        _capture_subscription = None
@@ -1,30 +1,147 @@
 import pickle
-import mediapipe as mp
-from ultralytics import YOLO
-from GazeTracking.gaze_tracking import GazeTracking
-
-mp_drawing_styles = mp.solutions.drawing_styles
-mp_drawing = mp.solutions.drawing_utils
-mp_hands = mp.solutions.hands
-
-hands = mp_hands.Hands(
-    static_image_mode=True,
-    max_num_hands=1,
-    min_detection_confidence=0.3,
-    min_tracking_confidence=0.3
-)
-
-yolo_model = YOLO("./yolo11n.pt", verbose=False)
+from model_registry import ModelRegistry
+from inference_server import InferenceService, predict_batch, analyze_batch
+
+# models are loaded on first use (or warmed up in the background), never at import time
+models = ModelRegistry()
+
+def load_mediapipe_solutions():
+    import mediapipe as mp
+    return mp.solutions
+
+def new_hands_tracker(mode=None):
+    """MediaPipe graphs keep per-stream state, every session gets its own"""
+    from hand_tracking import HandTracker
+    return HandTracker(
+        models.get("mediapipe").hands,
+        mode=mode or HAND_TRACKING_MODE,
+        max_num_hands=1,
+        min_detection_confidence=0.3,
+        min_tracking_confidence=0.3
+    )
+
+def load_yolo():
+    from ultralytics import YOLO
+    return YOLO("./yolo11n.pt", verbose=False)
+
+def load_gesture_classifier():
+    from gesture_features import CompiledForest
+    with open('./classifier-new.p', 'rb') as file:
+        model_dict = pickle.load(file)
+    # evaluated from the stacked tree arrays, without sklearn's per-call overhead
+    return CompiledForest(model_dict['classifier-new'])
+
+def load_gaze_predictor():
+    from GazeTracking.gaze_tracking import GazeTracking
+    return GazeTracking.load_predictor()
+
+def new_gaze_tracker():
+    """Gaze calibration is per user, every session gets its own tracker sharing the landmarks model"""
+    from GazeTracking.gaze_tracking import GazeTracking
+    return GazeTracking(predictor=models.get("gaze_predictor"), detection_width=GAZE_DETECTION_WIDTH,
+                        redetect_interval=GAZE_REDETECT_INTERVAL, pupil_method=GAZE_PUPIL_METHOD)
+
+def load_deepface():
+    from deepface import DeepFace
+    try:
+        DeepFace.build_model(model_name="Emotion", task="facial_attribute")
+    except TypeError:
+        # deepface releases before 0.0.90 take the model name only
+        DeepFace.build_model("Emotion")
+    return DeepFace
+
+def load_face_recognition():
+    import face_recognition
+    return face_recognition
+
+models.register("mediapipe", load_mediapipe_solutions)
+models.register("yolo", load_yolo)
+models.register("gesture_classifier", load_gesture_classifier)
+models.register("gaze_predictor", load_gaze_predictor)
+models.register("deepface", load_deepface)
+models.register("face_recognition", load_face_recognition)
+
+# seconds a request waits for other sessions' requests to join its batch
+INFERENCE_MAX_LATENCY = 0.01
+INFERENCE_MAX_BATCH_SIZE = 8
+
+# one instance of the heavy models serves every session, see inference_server.py
+inference = InferenceService(models)
+inference.register("yolo", predict_batch, max_batch_size=INFERENCE_MAX_BATCH_SIZE, max_latency=INFERENCE_MAX_LATENCY)
+inference.register("deepface", analyze_batch, max_batch_size=INFERENCE_MAX_BATCH_SIZE, max_latency=INFERENCE_MAX_LATENCY)
+
+AUTHENTICATION_MODELS = ["face_recognition"]
+TEACHER_MODELS = ["mediapipe", "gesture_classifier"]
+KID_MODELS = TEACHER_MODELS + ["gaze_predictor", "yolo", "deepface"]
+
 animals = {"cat", "dog", "bird", "horse", "sheep", "giraffe", "bear", "zebra", "elephant", "cow"}
 
-emotion_buffer = []
 emotions = ["happy", "sad", "angry", "neutral"]
 
-model_dict = pickle.load(open('./classifier-new.p', 'rb'))
-model = model_dict['classifier-new']
 labels_dict_kid = {0: 'Rotate', 1: 'Home', 2: 'Farm', 3: 'WildLife', 4: 'Select', 5: 'Back'}
 labels_dict_teacher = {0: 'HappyKids', 1: 'SadKids', 2: 'NeutralKids', 3: 'FearKids', 4: 'AngryKids', 5: "SurpriseStudents"}
-labels_dict = None
 
+# every session writes its files to SESSIONS_DIR/<session id>/
+SESSIONS_DIR = "sessions"
 CSV_FILE = "gaze_coordinates.csv"
-gaze = GazeTracking()
+GAZE_SAMPLES_FILE = "gaze_samples.bin"
+HEATMAP_FILE = "heatmap.png"
+HEATMAP_BINS = (64, 48)
+# live heatmap snapshots are rendered at most once every HEATMAP_RENDER_INTERVAL seconds
+HEATMAP_RENDER_INTERVAL = 5.0
+
+PIPELINE_QUEUE_SIZE = 1
+PIPELINE_REPORT_INTERVAL = 10
+
+# seconds during which a repeated "Kind:label" message is not sent again
+# gestures are already gated by the GestureStateMachine, their cooldown only guards against flicker
+EVENT_COOLDOWNS = {"Animal": 2.5, "Gesture": 0.5, "Habitat": 0.5, "ReportType": 0.5}
+DEFAULT_EVENT_COOLDOWN = 2.0
+
+FACE_RECOGNITION_TIMEOUT = 10
+
+# the gaze tracker detects faces on frames downscaled to GAZE_DETECTION_WIDTH pixels
+# and follows them with a correlation tracker for GAZE_REDETECT_INTERVAL frames
+GAZE_DETECTION_WIDTH = 320
+GAZE_REDETECT_INTERVAL = 10
+# pupil localizer, "contours", "components" or "projection" (see GazeTracking/compare_pupils.py)
+GAZE_PUPIL_METHOD = "contours"
+# pupil thresholds found for a user are kept in CALIBRATIONS_DIR/<user id>.json for their next visit
+CALIBRATIONS_DIR = "calibrations"
+
+# "video" tracks the hand landmarks between frames of the live stream, "static" detects the palm on every frame
+HAND_TRACKING_MODE = "video"
+
+# a gesture is sent once its probability, averaged over GESTURE_WINDOW frames,
+# stayed above GESTURE_CONFIDENCE_THRESHOLD for GESTURE_HOLD_SECONDS
+GESTURE_WINDOW = 8
+GESTURE_HOLD_SECONDS = 0.4
+GESTURE_CONFIDENCE_THRESHOLD = 0.6
+
+# face crops per second sent to the emotion model, the face box comes from the gaze tracker
+EMOTION_SAMPLE_RATE = 2.0
+# fraction of the face box added on every side of the crop
+EMOTION_FACE_MARGIN = 0.2
+# the emotion timeline of a session is kept and saved in buckets of EMOTION_BUCKET_SECONDS
+EMOTION_BUCKET_SECONDS = 60
+EMOTION_TIMELINE_LENGTH = 240
+
+# YOLO runs on one frame out of ANIMAL_DETECTION_STRIDE (or on a scene change), animals are tracked in between
+ANIMAL_DETECTION_STRIDE = 5
+ANIMAL_DETECTION_CONFIDENCE = 0.25
+# mean absolute difference (0-255) of the downscaled grayscale frame that counts as a new scene
+ANIMAL_SCENE_CHANGE_THRESHOLD = 12.0
+
+SERVER_HOST = "localhost"
+SERVER_PORT = 5000
+MAX_SESSIONS = 32
+# frame source (camera index, stream URL, video file) of every kiosk, by client IP address.
+# Clients missing from it read the server's own camera (cam.FRAME_SOURCE); a source
+# serves one session at a time, a second client on the same source is turned away.
+KIOSK_FRAME_SOURCES = {}
+# outbound lines buffered per client before senders have to wait for it
+CLIENT_QUEUE_SIZE = 256
+CLIENT_SEND_TIMEOUT = 5.0
+# debug windows are drawn from the session threads and OpenCV HighGUI is not thread-safe,
+# only turn this on with a single session (MAX_SESSIONS = 1)
+SHOW_SERVER_FRAMES = False
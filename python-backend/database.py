@@ -1,5 +1,6 @@
 from rich import print
 import sqlite3
+import json
 
 def connect_to_database():
     db_connection = sqlite3.connect('./database.db')
@@ -29,15 +30,57 @@ def create_database():
     )
     ''')
     
+    migrate_emotion_tables(db)
     connection.commit()
     connection.close()
 
-def save_user_average_emotion_to_database(user_id: int, average_emotion: str):
+def migrate_emotion_tables(db: sqlite3.Cursor):
+    """Adds the emotion timeline table and the distribution columns to databases created before them"""
+    db.execute(''' 
+    CREATE TABLE IF NOT EXISTS emotion_timeline (
+        timeline_id INTEGER PRIMARY KEY,
+        session_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        minute INTEGER NOT NULL,
+        bucket_start REAL NOT NULL,
+        samples INTEGER NOT NULL,
+        dominant_emotion TEXT,
+        scores TEXT,
+        FOREIGN KEY (user_id) REFERENCES users(user_id)
+    )
+    ''')
+
+    columns = {row[1] for row in db.execute("PRAGMA table_info(experiences)").fetchall()}
+    for column, column_type in (("session_id", "INTEGER"), ("emotion_distribution", "TEXT"), ("emotion_trend", "TEXT")):
+        if column not in columns:
+            db.execute(f"ALTER TABLE experiences ADD COLUMN {column} {column_type}")
+
+def migrate_database():
+    """Brings an existing database up to date, run once when the server starts"""
+    db, db_connection = connect_to_database()
+    migrate_emotion_tables(db)
+    db_connection.commit()
+    db_connection.close()
+
+def save_emotion_timeline_bucket(session_id: int, user_id: int, bucket: dict):
+    db, db_connection = connect_to_database()
+    db.execute('''
+                INSERT INTO emotion_timeline (session_id, user_id, minute, bucket_start, samples, dominant_emotion, scores)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (session_id, user_id, bucket["minute"], bucket["start"], bucket["samples"],
+                      bucket["dominant"], json.dumps(bucket["scores"])))
+    db_connection.commit()
+    db_connection.close()
+
+def save_user_average_emotion_to_database(user_id: int, average_emotion: str, distribution: dict = None,
+                                          trend: list = None, session_id: int = None):
     db, db_connection = connect_to_database()
     db.execute('''
-                INSERT INTO experiences (user_id, average_emotion)
-                VALUES (?, ?)
-                ''', (user_id, average_emotion))
+                INSERT INTO experiences (user_id, average_emotion, session_id, emotion_distribution, emotion_trend)
+                VALUES (?, ?, ?, ?, ?)
+                ''', (user_id, average_emotion, session_id,
+                      json.dumps(distribution) if distribution is not None else None,
+                      json.dumps([(bucket["minute"], bucket["dominant"]) for bucket in trend]) if trend is not None else None))
     db_connection.commit()
     db_connection.close()
     print(f"User with ID: {user_id}, Average Emotion: {average_emotion} has been saved to the database succesfully!")
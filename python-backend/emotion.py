@@ -1,14 +1,96 @@
+import time
 import cam
-from deepface import DeepFace
+from threading import Event
+from constants import inference
 
 
+def analyze_emotion(image):
+    """Returns the dominant emotion and the emotion -> percentage scores of the face in image"""
+    result = inference.infer("deepface", image, actions=['emotion'], enforce_detection=False)[0]
+    return result['dominant_emotion'], result['emotion']
+
 def detect_emotion(image):
-    result = DeepFace.analyze(image,actions=['emotion'], enforce_detection=False)[0]
-    dominant_emotion = result['dominant_emotion']
+    dominant_emotion, _ = analyze_emotion(image)
     return dominant_emotion
 
+def crop_face(frame, box, margin=0.2):
+    """Crops the (x1, y1, x2, y2) face box out of frame, grown by margin on every side"""
+    x1, y1, x2, y2 = box
+    grow_x, grow_y = int((x2 - x1) * margin), int((y2 - y1) * margin)
+    height, width = frame.shape[:2]
+    return frame[max(y1 - grow_y, 0):min(y2 + grow_y, height), max(x1 - grow_x, 0):min(x2 + grow_x, width)]
+
+def analyze_face_crop(crop):
+    """Queues a face crop for the shared emotion model, DeepFace skips its own face detector"""
+    return inference.submit("deepface", crop, actions=['emotion'], enforce_detection=False, detector_backend='skip')
+
+
+class EmotionSampler(object):
+    """
+    This class samples the faces found by the gaze tracker at `rate` crops
+    per second and sends them to the emotion model, so DeepFace never runs
+    its own face detector nor sees every frame. At most one crop per session
+    is in flight; on_emotion is called with the DeepFace result of each crop.
+    """
+
+    def __init__(self, on_emotion, analyze=analyze_face_crop, rate=2.0, margin=0.2, min_face_size=32):
+        self.on_emotion = on_emotion
+        self.analyze = analyze
+        self.interval = 1.0 / rate if rate else 0.0
+        self.margin = margin
+        self.min_face_size = min_face_size
+        self.offered = 0
+        self.sampled = 0
+        self.failed = 0
+        self._last_sample = None
+        # set while no crop is in flight, cleared until its result was delivered
+        self._idle = Event()
+        self._idle.set()
+
+    def offer(self, frame, face_box, now=None):
+        """Samples frame if a face was found, the interval elapsed and the previous crop is done"""
+        self.offered += 1
+        if face_box is None:
+            return False
+
+        x1, y1, x2, y2 = face_box
+        if min(x2 - x1, y2 - y1) < self.min_face_size:
+            return False
+
+        now = time.monotonic() if now is None else now
+        if self._last_sample is not None and now - self._last_sample < self.interval:
+            return False
+        if not self._idle.is_set():
+            return False
+
+        self._last_sample = now
+        self.sampled += 1
+        self._idle.clear()
+        # copy the crop, so the queued request does not keep the whole frame alive through a view
+        future = self.analyze(crop_face(frame, face_box, self.margin).copy())
+        future.add_done_callback(self._deliver)
+        return True
+
+    def _deliver(self, future):
+        try:
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                self.failed += 1
+                print(f"Error detecting emotion: {future.exception()}")
+                return
+            self.on_emotion(future.result()[0])
+        finally:
+            self._idle.set()
+
+    def drain(self, timeout=None):
+        """Waits until the crop in flight, if any, was delivered; returns False on timeout"""
+        return self._idle.wait(timeout)
+
+    def report(self):
+        return {"offered": self.offered, "sampled": self.sampled, "failed": self.failed}
+
 if __name__ == "__main__":
     _, image = cam.capture_image()
     result = detect_emotion(image)
     print(f"dominant emotion is: {result}")
-    
\ No newline at end of file
@@ -0,0 +1,124 @@
+import time
+import numpy as np
+from collections import deque
+from threading import Lock
+
+
+class EmotionAggregator(object):
+    """
+    This class summarizes the emotions detected during one session in
+    constant memory: running counts and confidence-weighted scores per
+    emotion, plus a timeline of fixed-length time buckets (one per minute by
+    default). Every bucket is handed to on_bucket when it closes, so it can
+    be persisted while the session is still running.
+    """
+
+    def __init__(self, emotions, bucket_seconds=60.0, timeline_length=240, on_bucket=None):
+        self.emotions = list(emotions)
+        self.bucket_seconds = bucket_seconds
+        self.on_bucket = on_bucket
+        self.timeline = deque(maxlen=timeline_length)
+        self.samples = 0
+        self.counts = np.zeros(len(self.emotions), dtype=np.int64)
+        self.weighted = np.zeros(len(self.emotions))
+        self.score_sums = np.zeros(len(self.emotions))
+        self._index = {emotion: i for i, emotion in enumerate(self.emotions)}
+        self._started_at = None
+        self._bucket = None
+        self._lock = Lock()
+
+    def _scores_vector(self, scores):
+        """Restricts the DeepFace percentages to the tracked emotions and normalizes them to sum to 1"""
+        vector = np.array([float(scores.get(emotion, 0.0)) for emotion in self.emotions])
+        total = vector.sum()
+        return vector / total if total > 0 else vector
+
+    def _new_bucket(self, index):
+        return {
+            "index": index,
+            "start": self._started_at + index * self.bucket_seconds,
+            "samples": 0,
+            "counts": np.zeros(len(self.emotions), dtype=np.int64),
+            "score_sums": np.zeros(len(self.emotions)),
+        }
+
+    def _export_bucket(self, bucket):
+        scores = bucket["score_sums"] / bucket["samples"] if bucket["samples"] else bucket["score_sums"]
+        return {
+            "minute": bucket["index"],
+            "start": bucket["start"],
+            "samples": bucket["samples"],
+            "dominant": self.emotions[int(scores.argmax())] if bucket["samples"] else None,
+            "counts": dict(zip(self.emotions, bucket["counts"].tolist())),
+            "scores": dict(zip(self.emotions, np.round(scores, 4).tolist())),
+        }
+
+    def _close_bucket(self):
+        if self._bucket is None or self._bucket["samples"] == 0:
+            return
+        bucket = self._export_bucket(self._bucket)
+        self.timeline.append(bucket)
+        self._bucket = None
+        if self.on_bucket is not None:
+            self.on_bucket(bucket)
+
+    def add(self, emotion, scores=None, now=None):
+        """
+        Adds one detection. scores is DeepFace's emotion -> percentage dict;
+        without it the detection counts as fully confident. Returns False for
+        emotions that are not tracked.
+        """
+        if emotion not in self._index:
+            return False
+
+        now = time.time() if now is None else now
+        position = self._index[emotion]
+        if scores:
+            vector = self._scores_vector(scores)
+        else:
+            vector = np.zeros(len(self.emotions))
+            vector[position] = 1.0
+
+        with self._lock:
+            if self._started_at is None:
+                self._started_at = now
+            index = int((now - self._started_at) // self.bucket_seconds)
+            if self._bucket is not None and self._bucket["index"] != index:
+                self._close_bucket()
+            if self._bucket is None:
+                self._bucket = self._new_bucket(index)
+
+            self.samples += 1
+            self.counts[position] += 1
+            self.weighted[position] += vector[position]
+            self.score_sums += vector
+            self._bucket["samples"] += 1
+            self._bucket["counts"][position] += 1
+            self._bucket["score_sums"] += vector
+        return True
+
+    def dominant(self):
+        """Returns the emotion with the highest confidence-weighted count, or None before any detection"""
+        with self._lock:
+            if self.samples == 0:
+                return None
+            return self.emotions[int(self.weighted.argmax())]
+
+    def distribution(self):
+        """Returns the mean score of every emotion over the session"""
+        with self._lock:
+            scores = self.score_sums / self.samples if self.samples else self.score_sums
+            return dict(zip(self.emotions, np.round(scores, 4).tolist()))
+
+    def close(self):
+        """Closes the running bucket and returns the session summary"""
+        with self._lock:
+            self._close_bucket()
+            timeline = list(self.timeline)
+        return {
+            "samples": self.samples,
+            "dominant": self.dominant(),
+            "counts": dict(zip(self.emotions, self.counts.tolist())),
+            "distribution": self.distribution(),
+            "timeline": timeline,
+        }
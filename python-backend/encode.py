@@ -1,29 +1,111 @@
 import os
-import face_recognition
+import json
+import hashlib
+from constants import models
+from encoding_store import EncodingStore
+from worker_pool import workers
 
 pic_dir = "./known-faces"
+store = EncodingStore("encodings/")
+manifest_path = "encodings/manifest.json"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+# the store is rewritten once this share of its rows belongs to replaced or removed images
+COMPACT_SUPERSEDED_FRACTION = 0.25
 
-def encode_all():
-    for person_name in os.listdir(pic_dir):
+def file_sha256(file_path):
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 16), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def load_manifest():
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as file:
+        return json.load(file)
+
+def save_manifest(manifest):
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(manifest, file, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+def list_known_images():
+    """Yields (key, person_name, file_path) for every image under pic_dir"""
+    for person_name in sorted(os.listdir(pic_dir)):
         person_path = os.path.join(pic_dir, person_name)
         if os.path.isdir(person_path):
-            encodings = []
             for path, folders, files in os.walk(person_path):
-                for filename in files:
-                    file_path = os.path.join(path, filename)
-                    try:
-                        image = face_recognition.load_image_file(file_path)
-                        face_encs = face_recognition.face_encodings(image)
-                        if face_encs:
-                            encodings.append(face_encs[0])
-                    except Exception as e:
-                        print(f"Error processing file {file_path}: {e}")
-
-            with open(f"encodings/{person_name}.csv", "w") as file:
-                for encoding in encodings:
-                    string = [str(val) for val in encoding.tolist()]
-                    file.write(",".join(string))
-                    file.write("\n")
-                    
+                for filename in sorted(files):
+                    if filename.lower().endswith(IMAGE_EXTENSIONS):
+                        file_path = os.path.join(path, filename)
+                        key = os.path.relpath(file_path, pic_dir).replace(os.sep, "/")
+                        yield key, person_name, file_path
+
+def encode_image(file_path):
+    """Returns the encodings of the first face found in the image (empty if none)"""
+    try:
+        face_recognition = models.get("face_recognition")
+        image = face_recognition.load_image_file(file_path)
+        face_encs = face_recognition.face_encodings(image)
+        return face_encs[:1]
+    except Exception as e:
+        print(f"Error processing file {file_path}: {e}")
+        return []
+
+def encode_all(parallel=False):
+    """Encodes new or modified images only, using the manifest of (path, mtime, size, sha)
+    recorded on the previous run. With parallel=True the images are encoded on a process pool."""
+    manifest = load_manifest()
+    stored_keys = set(store.keys())
+    up_to_date = {}
+    pending = []
+
+    for key, person_name, file_path in list_known_images():
+        stat = os.stat(file_path)
+        entry = manifest.get(key)
+        if entry and key in stored_keys and entry["person"] == person_name:
+            if entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                up_to_date[key] = entry
+                continue
+
+            # touched but same content, only refresh the cheap fields
+            sha = file_sha256(file_path)
+            if entry["sha256"] == sha:
+                up_to_date[key] = dict(entry, mtime=stat.st_mtime_ns, size=stat.st_size)
+                continue
+        else:
+            sha = file_sha256(file_path)
+
+        pending.append((key, person_name, file_path, {
+            "person": person_name, "mtime": stat.st_mtime_ns, "size": stat.st_size, "sha256": sha,
+        }))
+
+    file_paths = [file_path for _, _, file_path, _ in pending]
+    if parallel and len(file_paths) > 1:
+        results = list(workers.map_process(encode_image, file_paths))
+    else:
+        results = [encode_image(file_path) for file_path in file_paths]
+
+    if pending:
+        store.put_many((key, person_name, encodings) for (key, person_name, _, _), encodings in zip(pending, results))
+    for key, _, _, entry in pending:
+        up_to_date[key] = entry
+
+    # images that were deleted, and per-person segments from older stores
+    store.remove(*(stored_keys - set(up_to_date)))
+    save_manifest(up_to_date)
+
+    superseded = store.superseded_fraction()
+    if superseded > COMPACT_SUPERSEDED_FRACTION:
+        try:
+            store.compact()
+            print(f"Compacted the encodings store, {superseded:.0%} of its rows were superseded.")
+        except OSError as e:
+            # on Windows the data file cannot be replaced while a FaceIndex still maps it
+            print(f"Could not compact the encodings store, retrying on the next run: {e}")
+    print(f"Encoded {len(pending)} new or modified images, {len(up_to_date) - len(pending)} unchanged.")
+
 if __name__ == "__main__":
-    encode_all()                    
+    encode_all(parallel=True)
@@ -0,0 +1,185 @@
+import os
+import json
+import numpy as np
+from threading import Lock
+
+DATA_FILE = "encodings.f32"
+INDEX_FILE = "encodings.json"
+# compact() writes generation n to encodings-<n>.f32
+GENERATION_FILE = "encodings-{}.f32"
+
+
+class EncodingStore(object):
+    """
+    Append-only binary store for face encodings.
+
+    All encodings live in a single raw little-endian float32 matrix
+    (`encodings.f32`) that is memory-mapped for reading, next to a JSON
+    sidecar (`encodings.json`) naming that data file and mapping every
+    segment key to its person name, row offset and row count. Writing a key
+    again appends a new segment and supersedes the old one; compact() drops
+    superseded rows into a new data file, so the sidecar swap is the only
+    change another store instance reading the same directory can observe.
+    """
+
+    def __init__(self, store_dir="encodings/", dim=128):
+        self.store_dir = store_dir
+        self.dim = dim
+        self.index_path = os.path.join(store_dir, INDEX_FILE)
+        self._lock = Lock()
+
+    def exists(self):
+        return os.path.exists(self.index_path)
+
+    def signature(self):
+        """Returns (size, mtime) of the sidecar, which is rewritten on every update"""
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def _read_index(self):
+        if not self.exists():
+            return {"dim": self.dim, "rows": 0, "segments": {}}
+        with open(self.index_path) as file:
+            index = json.load(file)
+        self.dim = index["dim"]
+        return index
+
+    def _data_path(self, index):
+        return os.path.join(self.store_dir, index.get("data_file", DATA_FILE))
+
+    def _write_index(self, index):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(index, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.index_path)
+
+    def put(self, key, name, vectors):
+        """Stores the encodings of one source (image or person) under `key`"""
+        self.put_many([(key, name, vectors)])
+
+    def put_many(self, items):
+        """Appends several (key, name, vectors) sources with a single sidecar rewrite"""
+        with self._lock:
+            os.makedirs(self.store_dir, exist_ok=True)
+            index = self._read_index()
+            with open(self._data_path(index), "ab") as file:
+                # the sidecar row count is authoritative, drop any torn write left by a crash
+                file.truncate(index["rows"] * self.dim * 4)
+                for key, name, vectors in items:
+                    vectors = np.asarray(vectors, dtype="<f4").reshape(-1, self.dim)
+                    file.write(vectors.tobytes())
+                    index["segments"][key] = {"name": name, "offset": index["rows"], "count": len(vectors)}
+                    index["rows"] += len(vectors)
+                file.flush()
+                os.fsync(file.fileno())
+            self._write_index(index)
+
+    def remove(self, *keys):
+        with self._lock:
+            index = self._read_index()
+            removed = [index["segments"].pop(key, None) for key in keys]
+            if any(segment is not None for segment in removed):
+                self._write_index(index)
+
+    def keys(self):
+        return list(self._read_index()["segments"])
+
+    def superseded_fraction(self):
+        """Returns the share of rows in the data file that no live segment points to"""
+        index = self._read_index()
+        if index["rows"] == 0:
+            return 0.0
+        live = sum(segment["count"] for segment in index["segments"].values())
+        return (index["rows"] - live) / index["rows"]
+
+    def matrix(self):
+        """Returns the whole memory-mapped matrix, superseded rows included"""
+        index = self._read_index()
+        if index["rows"] == 0:
+            return np.empty((0, self.dim), dtype=np.float32), index
+        matrix = np.memmap(self._data_path(index), dtype="<f4", mode="r", shape=(index["rows"], self.dim))
+        return matrix, index
+
+    def load(self):
+        """Returns (names, matrix, label_ids) for every live encoding.
+
+        The matrix is the memory map itself when no rows are superseded,
+        otherwise the live rows are gathered into one contiguous array.
+        """
+        matrix, index = self.matrix()
+        segments = sorted((segment for segment in index["segments"].values() if segment["count"] > 0),
+                          key=lambda segment: segment["offset"])
+
+        names = []
+        label_of = {}
+        label_ids = np.empty(sum(segment["count"] for segment in segments), dtype=np.int64)
+        rows = np.empty(len(label_ids), dtype=np.int64)
+        position = 0
+        for segment in segments:
+            label = label_of.setdefault(segment["name"], len(names))
+            if label == len(names):
+                names.append(segment["name"])
+            count = segment["count"]
+            label_ids[position:position + count] = label
+            rows[position:position + count] = np.arange(segment["offset"], segment["offset"] + count)
+            position += count
+
+        if len(rows) != matrix.shape[0]:
+            matrix = np.ascontiguousarray(matrix[rows])
+        return names, matrix, label_ids
+
+    def _remove_old_generations(self, index):
+        """Deletes the data files the sidecar no longer names. They are only removed on
+        the compaction after the one that replaced them, so readers of the previous sidecar are done with them."""
+        current = index.get("data_file", DATA_FILE)
+        for file_name in os.listdir(self.store_dir):
+            if file_name != current and (file_name == DATA_FILE or
+                                         (file_name.startswith("encodings-") and file_name.endswith(".f32"))):
+                try:
+                    os.remove(os.path.join(self.store_dir, file_name))
+                except OSError:
+                    # still memory-mapped by a reader on a platform that cannot delete it, retried on the next compaction
+                    pass
+
+    def compact(self):
+        """Writes the live rows to the next generation data file, then swaps the sidecar to it"""
+        with self._lock:
+            matrix, index = self.matrix()
+            self._remove_old_generations(index)
+            segments = sorted(index["segments"].items(), key=lambda item: item[1]["offset"])
+            live = [np.asarray(matrix[s["offset"]:s["offset"] + s["count"]]) for _, s in segments]
+            del matrix
+
+            generation = index.get("generation", 0) + 1
+            new_index = {"dim": self.dim, "rows": 0, "segments": {},
+                         "generation": generation, "data_file": GENERATION_FILE.format(generation)}
+            with open(self._data_path(new_index), "wb") as file:
+                for (key, segment), vectors in zip(segments, live):
+                    file.write(vectors.astype("<f4").tobytes())
+                    new_index["segments"][key] = {"name": segment["name"], "offset": new_index["rows"], "count": len(vectors)}
+                    new_index["rows"] += len(vectors)
+                file.flush()
+                os.fsync(file.fileno())
+            self._write_index(new_index)
+
+
+def migrate_csv_encodings(csv_dir="encodings/", store=None):
+    """Copies every encodings/<name>.csv file into the binary store"""
+    from recognize import read_encodings
+
+    store = store or EncodingStore(csv_dir)
+    encodings = read_encodings(csv_dir)
+    for name, vectors in encodings.items():
+        if vectors:
+            store.put(name, name, np.vstack(vectors))
+    print(f"Migrated {len(encodings)} people from {csv_dir} to {store.store_dir}")
+    return store
+
+
+if __name__ == "__main__":
+    migrate_csv_encodings("encodings/")
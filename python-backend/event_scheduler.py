@@ -0,0 +1,45 @@
+import time
+from threading import Lock
+
+
+class EventDebouncer(object):
+    """
+    This class rate-limits outbound "Kind:label" messages.
+    A message is suppressed while the same kind and label was already
+    emitted within the cooldown configured for its kind.
+    """
+
+    def __init__(self, cooldowns=None, default_cooldown=2.0):
+        self.cooldowns = dict(cooldowns or {})
+        self.default_cooldown = default_cooldown
+        self.suppressed = 0
+        self._last_emitted = {}
+        self._lock = Lock()
+
+    def cooldown(self, kind):
+        """Returns the cooldown in seconds for the given message kind"""
+        return self.cooldowns.get(kind, self.default_cooldown)
+
+    def should_emit(self, message, now=None):
+        """Returns True if the message may be sent now, and records it as sent.
+
+        Arguments:
+            message (str): Protocol line without the trailing newline, e.g. "Animal:cat"
+            now (float): Optional monotonic timestamp, defaults to time.monotonic()
+        """
+        now = time.monotonic() if now is None else now
+        kind = message.split(":", 1)[0]
+
+        with self._lock:
+            last = self._last_emitted.get(message)
+            if last is not None and now - last < self.cooldown(kind):
+                self.suppressed += 1
+                return False
+
+            self._last_emitted[message] = now
+            return True
+
+    def reset(self):
+        with self._lock:
+            self._last_emitted.clear()
+            self.suppressed = 0
@@ -0,0 +1,131 @@
+import os
+import time
+import numpy as np
+from threading import Lock
+from encoding_store import EncodingStore, migrate_csv_encodings
+from face_search import make_search_backend
+
+
+class FaceIndex(object):
+    """
+    This class keeps every known face encoding in memory as one contiguous
+    float32 matrix with a parallel label array, and matches a probe encoding
+    against the whole roster with a single vectorized distance computation.
+    The index reloads itself when the encoding store is updated.
+
+    With an approximate search backend ("ivf") only the people owning one of
+    the `candidates` nearest encodings are checked against the acceptance rule.
+    """
+
+    def __init__(self, encodings_dir="encodings/", reload_interval=1.0, backend="brute", candidates=32, **backend_options):
+        self.encodings_dir = encodings_dir
+        self.store = EncodingStore(encodings_dir)
+        self.reload_interval = reload_interval
+        self.backend = backend
+        self.backend_options = backend_options
+        self.candidates = candidates
+        self.names = []
+        self.matrix = np.empty((0, 128), dtype=np.float32)
+        self.label_ids = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.person_rows = np.empty(0, dtype=np.int64)
+        self.person_offsets = np.zeros(1, dtype=np.int64)
+        self.search = make_search_backend(backend, **backend_options)
+        self._signature = None
+        self._last_check = 0.0
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def load(self, encodings):
+        """Builds the matrix from a {name: [encoding, ...]} dictionary"""
+        names = [name for name in encodings if len(encodings[name]) > 0]
+        rows = [np.asarray(encoding, dtype=np.float32) for name in names for encoding in encodings[name]]
+        label_ids = [label for label, name in enumerate(names) for _ in encodings[name]]
+
+        matrix = np.ascontiguousarray(np.vstack(rows), dtype=np.float32) if rows else np.empty((0, 128), dtype=np.float32)
+        self.load_arrays(names, matrix, np.asarray(label_ids, dtype=np.int64))
+
+    def load_arrays(self, names, matrix, label_ids):
+        """Uses already built arrays, e.g. the memory map of an EncodingStore"""
+        search = make_search_backend(self.backend, **self.backend_options)
+        search.build(matrix)
+        counts = np.bincount(label_ids, minlength=len(names))
+
+        with self._lock:
+            self.names = names
+            self.matrix = matrix
+            self.label_ids = label_ids
+            self.counts = counts
+            self.person_rows = np.argsort(label_ids, kind="stable")
+            self.person_offsets = np.concatenate(([0], np.cumsum(counts)))
+            self.search = search
+
+    def reload(self):
+        """Re-reads every encoding from the store, migrating old CSV files first if needed"""
+        if not self.store.exists() and os.path.isdir(self.encodings_dir) \
+                and any(name.endswith(".csv") for name in os.listdir(self.encodings_dir)):
+            migrate_csv_encodings(self.encodings_dir, self.store)
+
+        signature = self.store.signature()
+        self.load_arrays(*self.store.load())
+        self._signature = signature
+        self._last_check = time.monotonic()
+
+    def refresh_if_stale(self):
+        """Reloads the index if the encoding store changed since the last load"""
+        now = time.monotonic()
+        if self._last_check and now - self._last_check < self.reload_interval:
+            return
+        self._last_check = now
+
+        if self._signature is None or self.store.signature() != self._signature:
+            self.reload()
+
+    def match(self, probe, tolerance=0.5, acceptance=0.75):
+        """Returns the name of the person matching the probe encoding, or None.
+
+        A person is accepted when at least `acceptance` of their encodings are
+        within `tolerance` of the probe; if several are accepted, the one with
+        the highest ratio (then the closest encoding) wins.
+        """
+        self.refresh_if_stale()
+        with self._lock:
+            names, matrix, label_ids, counts, search = self.names, self.matrix, self.label_ids, self.counts, self.search
+            person_rows, person_offsets = self.person_rows, self.person_offsets
+
+        if matrix.shape[0] == 0:
+            return None
+
+        probe = np.asarray(probe, dtype=np.float32)
+        if search.exact:
+            distances = np.linalg.norm(matrix - probe, axis=1)
+            accepted = np.bincount(label_ids, weights=distances <= tolerance, minlength=len(names))
+            ratios = accepted / counts
+
+            candidates = np.flatnonzero(ratios >= acceptance)
+            if candidates.size == 0:
+                return None
+
+            closest = np.full(len(names), np.inf)
+            np.minimum.at(closest, label_ids, distances)
+            closest, ratios = closest[candidates], ratios[candidates]
+        else:
+            rows, distances = search.search(probe, k=self.candidates)
+            labels = np.unique(label_ids[rows[distances <= tolerance]])
+            ratios = np.empty(len(labels))
+            closest = np.empty(len(labels))
+            for i, label in enumerate(labels):
+                own_rows = person_rows[person_offsets[label]:person_offsets[label + 1]]
+                own_distances = np.linalg.norm(matrix[own_rows] - probe, axis=1)
+                ratios[i] = np.mean(own_distances <= tolerance)
+                closest[i] = own_distances.min()
+
+            accepted = ratios >= acceptance
+            if not accepted.any():
+                return None
+            candidates, closest, ratios = labels[accepted], closest[accepted], ratios[accepted]
+
+        best = candidates[np.lexsort((closest, -ratios))[0]]
+        return names[best]
@@ -1,11 +1,22 @@
 import recognize
 import emotion
+from face_index import FaceIndex
+
+# loaded once on first use, reloads itself when encode_all rewrites the encodings
+# use backend="ivf" for large rosters
+face_index = FaceIndex("encodings/", backend="brute")
 
 def detect_face(image):
-    encodings = recognize.read_encodings("encodings/")
-    result = recognize.recognize_face(image,encodings)
+    result = recognize.recognize_face_in_index(image,face_index)
     return result
 
+def authenticate_face(image, authenticator):
+    """tracks the face across calls with the caller's own FaceAuthenticator, returns a name once enough frames agree"""
+    name = authenticator.process(image)
+    if name is None:
+        return "can't identify the person in the picture yet"
+    return name
+
 def detect_emotion(image):
     result = emotion.detect_emotion(image)
     return result
\ No newline at end of file
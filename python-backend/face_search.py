@@ -0,0 +1,129 @@
+import numpy as np
+
+
+def squared_distances(vectors, points):
+    """Returns the squared L2 distances between every row of vectors and every row of points"""
+    distances = (vectors * vectors).sum(axis=1)[:, None] - 2.0 * vectors @ points.T + (points * points).sum(axis=1)[None, :]
+    return np.maximum(distances, 0.0, out=distances)
+
+
+def top_k(distances, k):
+    """Returns the indices of the k smallest distances, closest first"""
+    k = min(k, len(distances))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    nearest = np.argpartition(distances, k - 1)[:k]
+    return nearest[np.argsort(distances[nearest])]
+
+
+class BruteForceSearch(object):
+    """
+    Exact search: computes the distance from the probe to every encoding.
+    """
+
+    exact = True
+
+    def __init__(self):
+        self.matrix = np.empty((0, 128), dtype=np.float32)
+
+    def build(self, matrix):
+        self.matrix = matrix
+
+    def search(self, probe, k=10):
+        """Returns (rows, distances) of the k nearest encodings, closest first"""
+        distances = np.linalg.norm(self.matrix - np.asarray(probe, dtype=np.float32), axis=1)
+        rows = top_k(distances, k)
+        return rows, distances[rows]
+
+
+class IVFSearch(object):
+    """
+    Inverted-file index: encodings are clustered with k-means into `n_lists`
+    cells, and a query only scans the `n_probe` cells whose centroids are the
+    closest to it. More probes means higher recall and higher latency.
+    """
+
+    exact = False
+
+    def __init__(self, n_lists=None, n_probe=8, iterations=10, train_size=50000, seed=0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.iterations = iterations
+        self.train_size = train_size
+        self.seed = seed
+        self.centroids = np.empty((0, 128), dtype=np.float32)
+        self.list_offsets = np.zeros(1, dtype=np.int64)
+        self.rows = np.empty(0, dtype=np.int64)
+        self.vectors = np.empty((0, 128), dtype=np.float32)
+
+    def _assign(self, matrix, chunk_size=8192):
+        """Returns the index of the closest centroid for every row, in chunks to bound memory"""
+        assignments = np.empty(len(matrix), dtype=np.int64)
+        for start in range(0, len(matrix), chunk_size):
+            chunk = np.asarray(matrix[start:start + chunk_size], dtype=np.float32)
+            assignments[start:start + chunk_size] = squared_distances(chunk, self.centroids).argmin(axis=1)
+        return assignments
+
+    def _train(self, matrix, n_lists):
+        rng = np.random.default_rng(self.seed)
+        sample_rows = rng.choice(len(matrix), size=min(len(matrix), self.train_size), replace=False)
+        sample = np.asarray(matrix[np.sort(sample_rows)], dtype=np.float32)
+        n_lists = min(n_lists, len(sample))
+        self.centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+
+        for _ in range(self.iterations):
+            assignments = self._assign(sample)
+            counts = np.bincount(assignments, minlength=n_lists)
+            filled = counts > 0
+            order = np.argsort(assignments, kind="stable")
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+            sums = np.add.reduceat(sample[order], starts, axis=0)
+            self.centroids[filled] = sums / counts[filled, None]
+            # restart empty cells on random samples so every list stays useful
+            empty = np.flatnonzero(~filled)
+            if empty.size:
+                self.centroids[empty] = sample[rng.choice(len(sample), size=empty.size, replace=False)]
+
+    def build(self, matrix):
+        if len(matrix) == 0:
+            self.centroids = np.empty((0, matrix.shape[1]), dtype=np.float32)
+            self.list_offsets = np.zeros(1, dtype=np.int64)
+            self.rows = np.empty(0, dtype=np.int64)
+            self.vectors = np.empty((0, matrix.shape[1]), dtype=np.float32)
+            return
+
+        n_lists = self.n_lists or max(1, int(4 * np.sqrt(len(matrix))))
+        n_lists = min(n_lists, len(matrix))
+        self._train(matrix, n_lists)
+
+        assignments = self._assign(matrix)
+        self.rows = np.argsort(assignments, kind="stable")
+        self.vectors = np.ascontiguousarray(np.asarray(matrix, dtype=np.float32)[self.rows])
+        self.list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=len(self.centroids)))))
+
+    def search(self, probe, k=10):
+        """Returns (rows, distances) of the k nearest encodings found in the probed cells"""
+        if len(self.rows) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        probe = np.asarray(probe, dtype=np.float32)
+        centroid_distances = squared_distances(probe[None, :], self.centroids)[0]
+        lists = top_k(centroid_distances, self.n_probe)
+
+        positions = np.concatenate([np.arange(self.list_offsets[cell], self.list_offsets[cell + 1]) for cell in lists])
+        distances = np.linalg.norm(self.vectors[positions] - probe, axis=1)
+        nearest = top_k(distances, k)
+        return self.rows[positions[nearest]], distances[nearest]
+
+
+SEARCH_BACKENDS = {
+    "brute": BruteForceSearch,
+    "ivf": IVFSearch,
+}
+
+
+def make_search_backend(name="brute", **options):
+    """Creates one of the SEARCH_BACKENDS by name"""
+    if name not in SEARCH_BACKENDS:
+        raise ValueError(f"Unknown face search backend: {name!r}, expected one of {list(SEARCH_BACKENDS)}")
+    return SEARCH_BACKENDS[name](**options)
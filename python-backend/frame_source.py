@@ -0,0 +1,229 @@
+import os
+import time
+import cv2
+from collections import deque
+from threading import Thread, Condition, Lock
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class CameraSource(object):
+    """Reads frames from a webcam, DirectShow is used on Windows like the rest of the server"""
+
+    def __init__(self, index=0, api=None):
+        self.index = index
+        self.api = api if api is not None else (cv2.CAP_DSHOW if os.name == "nt" else cv2.CAP_ANY)
+        self._capture = None
+
+    def open(self):
+        self._capture = cv2.VideoCapture(self.index, self.api)
+        return self._capture.isOpened()
+
+    def read(self):
+        return self._capture.read()
+
+    def release(self):
+        if self._capture is not None:
+            self._capture.release()
+
+
+class VideoFileSource(object):
+    """Reads frames from a recorded video, paced at the video frame rate when realtime is set"""
+
+    def __init__(self, path, realtime=True, loop=False):
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+        self._capture = None
+        self._frame_interval = 0.0
+        self._next_frame_at = 0.0
+
+    def open(self):
+        self._capture = cv2.VideoCapture(self.path)
+        fps = self._capture.get(cv2.CAP_PROP_FPS) or 0
+        self._frame_interval = 1.0 / fps if self.realtime and fps > 0 else 0.0
+        self._next_frame_at = time.perf_counter()
+        return self._capture.isOpened()
+
+    def read(self):
+        if self._frame_interval:
+            delay = self._next_frame_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self._next_frame_at = max(self._next_frame_at + self._frame_interval, time.perf_counter())
+
+        ret, frame = self._capture.read()
+        if not ret and self.loop:
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._capture.read()
+        return ret, frame
+
+    def release(self):
+        if self._capture is not None:
+            self._capture.release()
+
+
+class ImageDirectorySource(object):
+    """Reads the images of a directory in name order, at `fps` frames per second (0 for as fast as possible)"""
+
+    def __init__(self, directory, fps=30, loop=False):
+        self.directory = directory
+        self.fps = fps
+        self.loop = loop
+        self._paths = []
+        self._position = 0
+
+    def open(self):
+        self._paths = sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                             if name.lower().endswith(IMAGE_EXTENSIONS))
+        self._position = 0
+        return len(self._paths) > 0
+
+    def read(self):
+        if self._position >= len(self._paths):
+            if not self.loop or not self._paths:
+                return False, None
+            self._position = 0
+
+        if self.fps:
+            time.sleep(1.0 / self.fps)
+        frame = cv2.imread(self._paths[self._position])
+        self._position += 1
+        return frame is not None, frame
+
+    def release(self):
+        self._paths = []
+
+
+def open_source(spec=0, realtime=True):
+    """Builds a source from a camera index, an image directory or a video file path.
+    With realtime=False files are read as fast as possible, for offline benchmarks."""
+    if isinstance(spec, int) or (isinstance(spec, str) and spec.isdigit()):
+        return CameraSource(int(spec))
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec, fps=30 if realtime else 0)
+    return VideoFileSource(spec, realtime=realtime)
+
+
+class FrameSource(object):
+    """
+    This class owns a frame source and reads it continuously on a background
+    grabber thread into a small ring buffer of the latest frames. Any number
+    of subscribers can then read from it without reopening the device.
+    """
+
+    def __init__(self, source, buffer_size=8):
+        self.source = source
+        self.frames = deque(maxlen=buffer_size)
+        self.frame_id = 0
+        self.ended = False
+        self._condition = Condition()
+        self._thread = None
+        self._running = False
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        """Opens the source and starts grabbing, also reopens a source whose read failed"""
+        if self._running:
+            return self
+        if self._thread is not None:
+            # the grabber of a failed read releases the source on its way out, let it finish first
+            self._thread.join()
+            self._thread = None
+        if not self.source.open():
+            raise IOError(f"Could not open frame source {self.source.__class__.__name__}")
+
+        self._running = True
+        self.ended = False
+        self._thread = Thread(target=self._grab, name="frame-grabber", daemon=True)
+        self._thread.start()
+        return self
+
+    def _grab(self):
+        while self._running:
+            ret, frame = self.source.read()
+            with self._condition:
+                if not ret:
+                    self.ended = True
+                    self._running = False
+                else:
+                    self.frame_id += 1
+                    self.frames.append((self.frame_id, time.monotonic(), frame))
+                self._condition.notify_all()
+        self.source.release()
+
+    def latest(self):
+        """Returns (frame_id, timestamp, frame) of the newest frame, or None"""
+        with self._condition:
+            return self.frames[-1] if self.frames else None
+
+    def wait_for_frame(self, after_id, timeout=None):
+        """Blocks until a frame newer than after_id is available, returns it or None on timeout/end"""
+        with self._condition:
+            self._condition.wait_for(lambda: self.frame_id > after_id or self.ended, timeout=timeout)
+            if self.frame_id > after_id:
+                return self.frames[-1]
+            return None
+
+    def subscribe(self):
+        return FrameSubscription(self)
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class FrameSubscription(object):
+    """
+    A reader of a FrameSource. Every read() returns the newest frame that
+    this subscriber has not seen yet, skipping frames it was too slow for.
+    """
+
+    def __init__(self, frame_source):
+        self.frame_source = frame_source
+        # start from the current frame, so the first read waits for a fresh one
+        self.last_id = frame_source.frame_id
+        self.skipped = 0
+
+    def read(self, timeout=5.0):
+        """Same contract as cv2.VideoCapture.read: returns (ret, frame)"""
+        latest = self.frame_source.wait_for_frame(self.last_id, timeout=timeout)
+        if latest is None:
+            return False, None
+
+        frame_id, _, frame = latest
+        self.skipped += frame_id - self.last_id - 1
+        self.last_id = frame_id
+        return True, frame
+
+
+class GrayscaleCache(object):
+    """
+    Converts a frame to grayscale once for all the stages that need it.
+    The pipeline hands the same frame object to every stage, so the last
+    few conversions are kept by frame identity.
+    """
+
+    def __init__(self, size=2):
+        self.entries = deque(maxlen=size)
+        self.hits = 0
+        self.conversions = 0
+        self._lock = Lock()
+
+    def get(self, frame):
+        with self._lock:
+            for cached_frame, gray in self.entries:
+                if cached_frame is frame:
+                    self.hits += 1
+                    return gray
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        with self._lock:
+            self.entries.append((frame, gray))
+            self.conversions += 1
+        return gray
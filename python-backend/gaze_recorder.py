@@ -0,0 +1,123 @@
+import csv
+import time
+import numpy as np
+from threading import Thread, Event, Lock
+
+DIRECTIONS = ["could not detect gaze", "Blinking", "Looking right", "Looking left", "Looking center"]
+DIRECTION_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+
+SAMPLE_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("session_id", "<i8"),
+    ("user_id", "<i8"),
+    ("direction", "u1"),
+    ("x", "<f4"),
+    ("y", "<f4"),
+])
+
+
+def load_gaze_samples(binary_file):
+    """Reads a binary gaze file written by GazeRecorder into a structured array (see SAMPLE_DTYPE)"""
+    return np.fromfile(binary_file, dtype=SAMPLE_DTYPE)
+
+
+class GazeRecorder(object):
+    """
+    This class records gaze samples without touching the disk on the frame loop.
+    Samples go into a preallocated NumPy ring and a background writer appends
+    them in batches to the CSV file and, optionally, to a raw binary file of
+    SAMPLE_DTYPE records.
+    """
+
+    def __init__(self, csv_file, binary_file=None, session_id=0, user_id=0,
+                 capacity=4096, flush_size=1024, flush_interval=10.0):
+        self.csv_file = csv_file
+        self.binary_file = binary_file
+        self.session_id = session_id
+        self.user_id = user_id
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.samples = np.zeros(capacity, dtype=SAMPLE_DTYPE)
+        self.recorded = 0
+        self.dropped = 0
+        self.writes = 0
+        self._head = 0
+        self._tail = 0
+        self._lock = Lock()
+        self._flush_event = Event()
+        self._stop_event = Event()
+        self._writer = None
+
+    def start(self):
+        """Truncates the output files and starts the background writer"""
+        with open(self.csv_file, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(["Looking Direction", "X", "Y", "Timestamp", "Session", "User"])
+        if self.binary_file:
+            open(self.binary_file, "wb").close()
+
+        self._writer = Thread(target=self._write_loop, name="gaze-writer", daemon=True)
+        self._writer.start()
+        return self
+
+    def record(self, looking_direction, x, y):
+        capacity = len(self.samples)
+        with self._lock:
+            if self._head - self._tail >= capacity:
+                # writer fell a whole ring behind, overwrite the oldest sample
+                self._tail += 1
+                self.dropped += 1
+
+            self.samples[self._head % capacity] = (
+                time.time(), self.session_id, self.user_id, DIRECTION_CODES.get(looking_direction, 0), x, y
+            )
+            self._head += 1
+            self.recorded += 1
+            pending = self._head - self._tail
+
+        if pending >= self.flush_size:
+            self._flush_event.set()
+
+    def _take_pending(self):
+        with self._lock:
+            positions = np.arange(self._tail, self._head) % len(self.samples)
+            batch = self.samples[positions]
+            self._tail = self._head
+        return batch
+
+    def _write_batch(self, batch):
+        if len(batch) == 0:
+            return
+
+        with open(self.csv_file, mode='a', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerows(zip(
+                (DIRECTIONS[code] for code in batch["direction"]),
+                batch["x"].tolist(),
+                batch["y"].tolist(),
+                batch["timestamp"].tolist(),
+                batch["session_id"].tolist(),
+                batch["user_id"].tolist(),
+            ))
+        if self.binary_file:
+            with open(self.binary_file, "ab") as file:
+                batch.tofile(file)
+        self.writes += 1
+
+    def _write_loop(self):
+        while not self._stop_event.is_set():
+            self._flush_event.wait(timeout=self.flush_interval)
+            self._flush_event.clear()
+            try:
+                self._write_batch(self._take_pending())
+            except Exception as e:
+                print(f"Error writing gaze samples: {e}")
+
+    def close(self):
+        """Stops the writer and flushes the remaining samples"""
+        self._stop_event.set()
+        self._flush_event.set()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        self._write_batch(self._take_pending())
@@ -0,0 +1,68 @@
+import time
+import numpy as np
+from collections import deque
+
+
+class GestureStateMachine(object):
+    """
+    This class turns per-frame gesture probabilities into commands. The
+    probabilities are averaged over a sliding window of frames; a gesture
+    becomes the new state once its mean probability stayed above the
+    confidence threshold for hold_duration seconds, and only that change of
+    state is reported. Holding a gesture fires it once; it can fire again
+    after the hand was lowered or another gesture took over.
+    """
+
+    def __init__(self, labels, window=8, hold_duration=0.4, confidence_threshold=0.6):
+        self.labels = list(labels)
+        self.hold_duration = hold_duration
+        self.confidence_threshold = confidence_threshold
+        self.window = deque(maxlen=window)
+        self.state = None
+        self.confidence = 0.0
+        self.frames = 0
+        self.transitions = 0
+        self._empty = np.zeros(len(self.labels))
+        self._sums = np.zeros(len(self.labels))
+        self._candidate = None
+        self._candidate_since = None
+
+    def update(self, probabilities=None, now=None):
+        """
+        Feeds the class probabilities of one frame (None when no hand was
+        seen). Returns the label of the newly entered gesture, or None.
+        """
+        now = time.monotonic() if now is None else now
+        probabilities = self._empty if probabilities is None else np.asarray(probabilities, dtype=float)
+        self.frames += 1
+
+        if len(self.window) == self.window.maxlen:
+            self._sums -= self.window[0]
+        self.window.append(probabilities)
+        self._sums += probabilities
+
+        mean = self._sums / len(self.window)
+        best = int(mean.argmax())
+        self.confidence = float(mean[best])
+        candidate = best if self.confidence >= self.confidence_threshold else None
+
+        if candidate != self._candidate or self._candidate_since is None:
+            self._candidate = candidate
+            self._candidate_since = now
+        if now - self._candidate_since < self.hold_duration or candidate == self.state:
+            return None
+
+        self.state = candidate
+        if candidate is None:
+            # released, the next gesture (even the same one) fires again
+            return None
+        self.transitions += 1
+        return self.labels[candidate]
+
+    def reset(self):
+        self.window.clear()
+        self._sums[:] = 0.0
+        self.state = None
+        self.confidence = 0.0
+        self._candidate = None
+        self._candidate_since = None
@@ -0,0 +1,93 @@
+import numpy as np
+
+NUM_LANDMARKS = 21
+FEATURES_PER_HAND = 2 * NUM_LANDMARKS
+
+
+class LandmarkFeatures(object):
+    """
+    This class turns MediaPipe hand landmarks into the classifier's feature
+    vector: every (x, y) minus the minimum x and y of the hands seen so far,
+    flattened as x0, y0, x1, y1, ... It reuses preallocated arrays, so the
+    returned vector is overwritten by the next call.
+    """
+
+    def __init__(self, max_hands=2):
+        self.points = np.empty((max_hands, NUM_LANDMARKS, 2))
+        self.features = np.empty(max_hands * FEATURES_PER_HAND)
+        self._minimums = np.empty((max_hands, 2))
+
+    def extract(self, multi_hand_landmarks):
+        """Returns the features of the given hands (max_hands at most), 42 values per hand"""
+        n_hands = min(len(multi_hand_landmarks), len(self.points))
+        points = self.points[:n_hands]
+        for hand, hand_landmarks in enumerate(multi_hand_landmarks[:n_hands]):
+            landmarks = hand_landmarks.landmark
+            points[hand, :, 0] = [landmark.x for landmark in landmarks]
+            points[hand, :, 1] = [landmark.y for landmark in landmarks]
+
+        # the minimum runs over this hand and the ones before it, like the original training script
+        minimums = self._minimums[:n_hands]
+        np.minimum.accumulate(points.min(axis=1), axis=0, out=minimums)
+
+        features = self.features[:n_hands * FEATURES_PER_HAND]
+        np.subtract(points, minimums[:, None, :], out=features.reshape(n_hands, NUM_LANDMARKS, 2))
+        return features
+
+
+def landmarks_to_features(multi_hand_landmarks):
+    """One-off version of LandmarkFeatures.extract returning a fresh array"""
+    return LandmarkFeatures(max_hands=len(multi_hand_landmarks)).extract(multi_hand_landmarks).copy()
+
+
+class CompiledForest(object):
+    """
+    Evaluates a fitted sklearn RandomForestClassifier from its trees' arrays
+    stacked into flat NumPy arrays. All trees are walked at once, one level
+    per step, without sklearn's per-call input validation, and the results
+    match predict / predict_proba of the original forest.
+    """
+
+    def __init__(self, forest):
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        sizes = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+        left, right, feature, threshold, value = [], [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+            # leaves point to themselves so extra steps keep them in place
+            left.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+            right.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+            counts = tree.value[:, 0, :]
+            value.append(counts / counts.sum(axis=1, keepdims=True))
+
+        self.classes_ = forest.classes_
+        self.n_features_in_ = forest.n_features_in_
+        self.roots = offsets.astype(np.intp)
+        self.left = np.concatenate(left).astype(np.intp)
+        self.right = np.concatenate(right).astype(np.intp)
+        self.feature = np.concatenate(feature).astype(np.intp)
+        self.threshold = np.concatenate(threshold)
+        self.value = np.concatenate(value)
+        self.max_depth = max(tree.max_depth for tree in trees)
+
+    def apply(self, X):
+        """Returns the leaf reached in every tree, shape (n_samples, n_trees)"""
+        # sklearn compares float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features_in_)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        return self.value[self.apply(X)].mean(axis=1)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
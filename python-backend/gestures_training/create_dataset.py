@@ -1,50 +1,42 @@
 import os
+import sys
 import pickle
 from rich import print
 import mediapipe as mp
 import cv2
 import matplotlib.pyplot as plt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from gesture_features import LandmarkFeatures
+from hand_tracking import HandTracker
+
 mp_hands = mp.solutions.hands
 mp_drawing = mp.solutions.drawing_utils
 mp_drawing_styles = mp.solutions.drawing_styles
 
-hands = mp_hands.Hands(static_image_mode=True, min_detection_confidence=0.3)
+# dataset images are unrelated to each other, the palm detector has to run on every one of them
+hands = HandTracker(mp_hands, mode="static", max_num_hands=2, min_detection_confidence=0.3)
 
 DATA_DIR = './data'
 
+landmark_features = LandmarkFeatures(max_hands=2)
+
 data = []
 labels = []
 for dir_ in os.listdir(DATA_DIR):
     print(f"processing directory: {dir_}")
     for img_path in os.listdir(os.path.join(DATA_DIR, dir_)):
-        data_aux = []
-
-        x_ = []
-        y_ = []
-
         img = cv2.imread(os.path.join(DATA_DIR, dir_, img_path))
         img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
 
         results = hands.process(img_rgb)
         if results.multi_hand_landmarks:
-            for hand_landmarks in results.multi_hand_landmarks:
-                for i in range(len(hand_landmarks.landmark)):
-                    x = hand_landmarks.landmark[i].x
-                    y = hand_landmarks.landmark[i].y
-
-                    x_.append(x)
-                    y_.append(y)
-
-                for i in range(len(hand_landmarks.landmark)):
-                    x = hand_landmarks.landmark[i].x
-                    y = hand_landmarks.landmark[i].y
-                    data_aux.append(x - min(x_))
-                    data_aux.append(y - min(y_))
-
-            data.append(data_aux)
+            data.append(landmark_features.extract(results.multi_hand_landmarks).tolist())
             labels.append(dir_)
 
+print(f"Hand tracking: {hands.report()}")
+hands.close()
+
 f = open('dataset.pickle', 'wb')
 pickle.dump({'data': data, 'labels': labels}, f)
 f.close()
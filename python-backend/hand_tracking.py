@@ -0,0 +1,68 @@
+import time
+
+HAND_TRACKING_MODES = ("video", "static")
+
+
+class HandTracker(object):
+    """
+    This class wraps MediaPipe Hands. In "video" mode the palm detector only
+    runs while fewer than max_num_hands hands are tracked and the landmarks
+    are followed from frame to frame otherwise; "static" mode runs the palm
+    detector on every image, which is what independent dataset images need.
+    MediaPipe does not report which path it took, so a frame counts as a
+    detection when the previous frame left a hand slot untracked.
+    """
+
+    def __init__(self, hands_solution, mode="video", max_num_hands=1,
+                 min_detection_confidence=0.3, min_tracking_confidence=0.3):
+        if mode not in HAND_TRACKING_MODES:
+            raise ValueError(f"unknown hand tracking mode {mode!r}, expected one of {HAND_TRACKING_MODES}")
+
+        self.mode = mode
+        self.max_num_hands = max_num_hands
+        self.hands = hands_solution.Hands(
+            static_image_mode=(mode == "static"),
+            max_num_hands=max_num_hands,
+            min_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence
+        )
+        self.frames = 0
+        self.detections = 0
+        self.tracked = 0
+        self.total_time = 0.0
+        self.last_latency = 0.0
+        self._tracked_hands = 0
+
+    def process(self, rgb_frame):
+        """Same contract as mediapipe Hands.process"""
+        if self.mode == "static" or self._tracked_hands < self.max_num_hands:
+            self.detections += 1
+        else:
+            self.tracked += 1
+
+        start = time.perf_counter()
+        results = self.hands.process(rgb_frame)
+        self.last_latency = time.perf_counter() - start
+        self.total_time += self.last_latency
+        self.frames += 1
+        self._tracked_hands = len(results.multi_hand_landmarks) if results.multi_hand_landmarks else 0
+        return results
+
+    def report(self):
+        """Returns how many frames ran the palm detector versus landmark tracking, and the mean latency"""
+        return {
+            "mode": self.mode,
+            "frames": self.frames,
+            "detections": self.detections,
+            "tracked": self.tracked,
+            "detection_ratio": round(self.detections / self.frames, 3) if self.frames else 0.0,
+            "mean_latency_ms": round(1000 * self.total_time / self.frames, 2) if self.frames else 0.0,
+        }
+
+    def reset(self):
+        """Forgets the tracked hands, the next frame runs the palm detector"""
+        self.hands.reset()
+        self._tracked_hands = 0
+
+    def close(self):
+        self.hands.close()
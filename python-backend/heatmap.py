@@ -1,7 +1,162 @@
-import matplotlib.pyplot as plt
-import pandas as pd
+import os
+import time
+import cv2
 import numpy as np
-import seaborn as sns
+from threading import Lock
+from worker_pool import workers
+
+
+def _bin_matrix(size, bins):
+    """Returns the (size, bins) one-hot matrix putting each of size pixels in its bin,
+    with the edges spanning the pixels and the last edge inclusive like np.histogram"""
+    span = size - 1
+    if span == 0:
+        # np.histogram widens an empty range to +-0.5, the single value lands in the middle bin
+        indices = np.full(size, bins // 2)
+    else:
+        indices = np.minimum(np.arange(size) * bins // span, bins - 1)
+    return np.eye(bins, dtype=np.int64)[indices]
+
+
+def occupied_histogram(counts, bins):
+    """
+    Rebin a per-pixel count grid to bins, sized to the occupied bounding box
+    the way np.histogram2d sizes its bins to the data's min/max.
+
+    Parameters:
+        counts (numpy.ndarray): Sample count of every pixel, rows are Y and columns are X.
+        bins (tuple): Output (bins_x, bins_y).
+    """
+    bins_x, bins_y = bins
+    rows = np.flatnonzero(counts.any(axis=1))
+    columns = np.flatnonzero(counts.any(axis=0))
+    if rows.size == 0:
+        return np.zeros((bins_y, bins_x), dtype=np.int64)
+
+    occupied = counts[rows[0]:rows[-1] + 1, columns[0]:columns[-1] + 1]
+    return _bin_matrix(occupied.shape[0], bins_y).T @ occupied @ _bin_matrix(occupied.shape[1], bins_x)
+
+
+class HeatmapAccumulator(object):
+    """
+    This class builds the gaze heatmap while the session runs: every sample
+    increments one pixel of a count grid covering the frame, and the grid is
+    only rebinned to the area the gaze covered when the heatmap is rendered,
+    so no end-of-session pass over the CSV is needed.
+    """
+
+    def __init__(self, width=480, height=320, bins=(64, 48), min_render_interval=5.0):
+        self.width = width
+        self.height = height
+        self.bins = bins
+        self.min_render_interval = min_render_interval
+        self.counts = np.zeros((height, width), dtype=np.int64)
+        self.samples = 0
+        self._last_render = None
+        self._lock = Lock()
+
+    def add(self, x, y):
+        """Adds one gaze sample in frame pixel coordinates, samples outside the frame are clamped"""
+        column = min(max(int(x), 0), self.width - 1)
+        row = min(max(int(y), 0), self.height - 1)
+        with self._lock:
+            self.counts[row, column] += 1
+            self.samples += 1
+
+    def grid(self):
+        """Returns the live heatmap binned over the area the gaze covered, rows are Y bins and columns are X bins"""
+        with self._lock:
+            counts = self.counts.copy()
+        return occupied_histogram(counts, self.bins)
+
+    def reset(self):
+        with self._lock:
+            self.counts[:] = 0
+            self.samples = 0
+
+    def snapshot(self, output_file="heatmap.png", force=False):
+        """Renders the current grid unless the last render is too recent; returns True if rendered"""
+        now = time.monotonic()
+        if not force and self._last_render is not None and now - self._last_render < self.min_render_interval:
+            return False
+        if self.samples == 0:
+            print("No gaze samples yet. No heatmap to generate.")
+            return False
+
+        self._last_render = now
+        render_heatmap_image(self.grid(), output_file)
+        return True
+
+
+def render_heatmap_image(heatmap_data, output_file="heatmap.png", size=(640, 480), colormap=cv2.COLORMAP_JET,
+                         smooth_sigma=0.0, reference_frame=None, alpha=0.5):
+    """
+    Render a heatmap grid (rows are Y bins, columns are X bins) straight to a colormapped PNG.
+
+    Parameters:
+        heatmap_data (numpy.ndarray): 2D histogram of gaze samples.
+        output_file (str): Path to save the generated heatmap image.
+        size (tuple): Output (width, height), ignored when a reference frame is given.
+        colormap (int): OpenCV colormap applied to the normalized grid.
+        smooth_sigma (float): Gaussian smoothing in grid cells, 0 disables it.
+        reference_frame (numpy.ndarray): Optional BGR frame the heatmap is blended onto.
+        alpha (float): Heatmap weight when blending onto the reference frame.
+    """
+    grid = np.asarray(heatmap_data, dtype=np.float32)
+    if smooth_sigma > 0:
+        grid = cv2.GaussianBlur(grid, (0, 0), smooth_sigma)
+
+    peak = grid.max()
+    normalized = (grid * (255.0 / peak) if peak > 0 else grid).astype(np.uint8)
+
+    if reference_frame is not None:
+        size = (reference_frame.shape[1], reference_frame.shape[0])
+    image = cv2.applyColorMap(cv2.resize(normalized, size, interpolation=cv2.INTER_LINEAR), colormap)
+    if reference_frame is not None:
+        image = cv2.addWeighted(image, alpha, reference_frame, 1.0 - alpha, 0)
+
+    cv2.imwrite(output_file, image)
+    print(f"Heatmap generated and saved to {output_file}.")
+    return image
+
+
+def _render_job(job):
+    heatmap_data, output_file, options = job
+    render_heatmap_image(heatmap_data, output_file, **options)
+    return output_file
+
+
+def render_heatmaps_batch(jobs, parallel=True, **options):
+    """
+    Render many heatmaps, in parallel on the worker process pool.
+
+    Parameters:
+        jobs (iterable): (heatmap_data, output_file) pairs.
+        parallel (bool): Use the process pool instead of rendering one by one.
+    """
+    jobs = [(heatmap_data, output_file, options) for heatmap_data, output_file in jobs]
+    if parallel and len(jobs) > 1:
+        return list(workers.map_process(_render_job, jobs))
+    return [_render_job(job) for job in jobs]
+
+
+def render_session_heatmaps(samples, output_dir="heatmaps", bins=(64, 48), parallel=True):
+    """
+    Render one heatmap per (session, user) found in recorded gaze samples.
+
+    Parameters:
+        samples (numpy.ndarray): Structured samples from gaze_recorder.load_gaze_samples.
+        output_dir (str): Folder receiving session-<session>_user-<user>.png files.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    keys = np.stack((samples["session_id"], samples["user_id"]), axis=1)
+    jobs = []
+    for session_id, user_id in np.unique(keys, axis=0):
+        selected = samples[(samples["session_id"] == session_id) & (samples["user_id"] == user_id)]
+        heatmap_data, _, _ = np.histogram2d(selected["y"], selected["x"], bins=[bins[1], bins[0]])
+        jobs.append((heatmap_data, os.path.join(output_dir, f"session-{session_id}_user-{user_id}.png")))
+    return render_heatmaps_batch(jobs, parallel=parallel)
+
 
 def generate_heatmap(csv_file, output_file="heatmap.png"):
     """
@@ -12,15 +167,15 @@ def generate_heatmap(csv_file, output_file="heatmap.png"):
         output_file (str): Path to save the generated heatmap image.
     """
     try:
-        # Read gaze coordinates from CSV
-        data = pd.read_csv(csv_file)
-        if data.empty:
+        # Read gaze coordinates (X and Y columns) from CSV
+        data = np.genfromtxt(csv_file, delimiter=",", skip_header=1, usecols=(1, 2), ndmin=2)
+        if data.size == 0:
             print("CSV file is empty. No heatmap to generate.")
             return
 
         # Extract X and Y coordinates
-        x_coords = data['X']
-        y_coords = data['Y']
+        x_coords = data[:, 0]
+        y_coords = data[:, 1]
 
         # Generate 2D histogram for heatmap data
         heatmap_data, x_edges, y_edges = np.histogram2d(x_coords, y_coords, bins=[64, 48])
@@ -28,17 +183,7 @@ def generate_heatmap(csv_file, output_file="heatmap.png"):
         # Normalize heatmap data
         heatmap_data = heatmap_data.T  # Transpose for correct orientation
 
-        # Plot heatmap
-        plt.figure(figsize=(10, 6))
-        sns.heatmap(heatmap_data, cmap='jet', cbar=True)
-        plt.title("Gaze Heatmap")
-        plt.xlabel("X Coordinates")
-        plt.ylabel("Y Coordinates")
-
-        # Save heatmap to file
-        plt.savefig(output_file)
-        plt.close()
-        print(f"Heatmap generated and saved to {output_file}.")
+        render_heatmap_image(heatmap_data, output_file)
 
     except Exception as e:
         print(f"Error generating heatmap: {e}")
@@ -0,0 +1,189 @@
+import time
+import queue
+from rich import print
+from collections import defaultdict
+from concurrent.futures import Future
+from threading import Thread, Event, Lock
+
+
+def predict_batch(model, items, **kwargs):
+    """Batch function for models whose predict() takes a list of inputs (YOLO)"""
+    return model.predict(items, **kwargs)
+
+
+def analyze_batch(model, items, **kwargs):
+    """Batch function for DeepFace: analyze() takes one image, the batch runs back to back on one thread"""
+    return [model.analyze(item, **kwargs) for item in items]
+
+
+class InferenceRequest(object):
+    def __init__(self, item, kwargs):
+        self.item = item
+        self.kwargs = kwargs
+        self.key = repr(sorted(kwargs.items()))
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchStats(object):
+    """Throughput counters of one model, per batch size"""
+
+    def __init__(self):
+        self.requests = 0
+        self.batches = defaultdict(int)
+        self.busy_time = defaultdict(float)
+        self.wait_time = 0.0
+        self._lock = Lock()
+
+    def update(self, batch, seconds):
+        now = time.perf_counter()
+        with self._lock:
+            self.requests += len(batch)
+            self.batches[len(batch)] += 1
+            self.busy_time[len(batch)] += seconds
+            self.wait_time += sum(now - seconds - request.enqueued_at for request in batch)
+
+    def report(self):
+        with self._lock:
+            batches = sum(self.batches.values())
+            return {
+                "requests": self.requests,
+                "batches": batches,
+                "mean_batch_size": round(self.requests / batches, 2) if batches else 0.0,
+                "mean_wait_ms": round(1000 * self.wait_time / self.requests, 2) if self.requests else 0.0,
+                "by_batch_size": {
+                    size: {
+                        "batches": count,
+                        "items_per_s": round(size * count / self.busy_time[size], 1) if self.busy_time[size] else 0.0,
+                    }
+                    for size, count in sorted(self.batches.items())
+                },
+            }
+
+
+class ModelBatcher(object):
+    """
+    Owns the request queue of one model. A single thread takes the first
+    waiting request, keeps collecting for at most max_latency seconds or
+    until max_batch_size requests arrived, then runs the batch function once
+    per group of requests sharing the same keyword arguments.
+    """
+
+    def __init__(self, name, registry, batch_fn, max_batch_size=8, max_latency=0.01):
+        self.name = name
+        self.registry = registry
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.requests = queue.Queue()
+        self.stats = BatchStats()
+        self._stop_event = Event()
+        self._thread = None
+        self._start_lock = Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._stop_event.clear()
+                self._thread = Thread(target=self._serve, name=f"inference-{self.name}", daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, item, **kwargs):
+        request = InferenceRequest(item, kwargs)
+        self.requests.put(request)
+        if self._thread is None:
+            self.start()
+        return request.future
+
+    def _collect(self):
+        try:
+            first = self.requests.get(timeout=0.5)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.perf_counter() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, model, batch):
+        start = time.perf_counter()
+        try:
+            results = self.batch_fn(model, [request.item for request in batch], **batch[0].kwargs)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        self.stats.update(batch, time.perf_counter() - start)
+
+        for request, result in zip(batch, results):
+            request.future.set_result(result)
+
+    def _serve(self):
+        while not self._stop_event.is_set():
+            batch = [request for request in self._collect() if request.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                model = self.registry.get(self.name)
+            except Exception as e:
+                print(f"Error loading model {self.name} for inference: {e}")
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            groups = defaultdict(list)
+            for request in batch:
+                groups[request.key].append(request)
+            for group in groups.values():
+                self._run(model, group)
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        while not self.requests.empty():
+            self.requests.get_nowait().future.cancel()
+
+
+class InferenceService(object):
+    """
+    This class serves the heavy models of the ModelRegistry to every session
+    through one queue per model, so a single instance of each model is kept
+    in memory no matter how many kiosks are connected, and requests coming
+    from different sessions at the same time are micro-batched together.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.batchers = {}
+
+    def register(self, name, batch_fn, max_batch_size=8, max_latency=0.01):
+        """Serves the registry model `name` through batch_fn(model, items, **kwargs) -> results"""
+        self.batchers[name] = ModelBatcher(name, self.registry, batch_fn, max_batch_size, max_latency)
+
+    def submit(self, name, item, **kwargs):
+        """Queues one input for the model and returns a Future of its result"""
+        return self.batchers[name].submit(item, **kwargs)
+
+    def infer(self, name, item, timeout=None, **kwargs):
+        """Blocking version of submit()"""
+        return self.submit(name, item, **kwargs).result(timeout=timeout)
+
+    def stop(self):
+        for batcher in self.batchers.values():
+            batcher.stop()
+
+    def report(self):
+        """Returns the request, batch and throughput counters of every served model"""
+        return {name: batcher.stats.report() for name, batcher in self.batchers.items()}
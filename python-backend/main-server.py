@@ -1,27 +1,29 @@
+import os
 import time
 import cv2
-import socket
 import json
-import csv
-import numpy as np
-import matplotlib
 from rich import print
-from collections import Counter
-from threading import Thread
-from thread_with_return_value import ThreadWithReturn
-from face_recognization_funcs import detect_emotion, detect_face
-from database import connect_to_database, save_user_average_emotion_to_database, insert_new_user
-from heatmap import generate_heatmap
+from functools import partial
+from concurrent.futures import TimeoutError
+from worker_pool import workers
+from pipeline import FramePipeline
+from animal_detection import AnimalDetector
+from gesture_engine import GestureStateMachine
+from session import Session
+from socket_server import HabitatServer
+from face_recognization_funcs import authenticate_face
+from emotion import EmotionSampler
+from database import connect_to_database, migrate_database, save_user_average_emotion_to_database, save_emotion_timeline_bucket, insert_new_user
+from emotion_aggregator import EmotionAggregator
 from encode import encode_all
+from gaze_recorder import GazeRecorder
 from constants import *
 import sqlite3
 import bluetooth_scan
 import cam
 
-matplotlib.use("agg")
-
 def register_new_user():
-    cap = cv2.VideoCapture(0)
+    cap = cam.get_frame_source().subscribe()
     while True:
         ret, frame = cap.read()
         frame = cv2.resize(frame, (480, 320))
@@ -41,28 +43,13 @@ def register_new_user():
     insert_new_user(name, image_path, mac_address, "Kid")
     
     cv2.imwrite(image_path, rgb) 
-    cap.release()
     cv2.destroyAllWindows()
     
     encode_all()
     
     return name
 
-def set_proper_labels_according_to_user_role(role):
-    global labels_dict
-    labels_dict = labels_dict_kid if role == "Kid" else labels_dict_teacher
-
-def initialize_gaze_coordinates_csv():
-    with open(CSV_FILE, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(["Looking Direction", "X", "Y"])
-
-def save_gaze_coordinates(looking_direction, x, y):
-    with open(CSV_FILE, mode='a', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow([looking_direction, x, y])
-
-def send_teacher_report(client_socket: socket.socket, db: sqlite3.Cursor):
+def send_teacher_report(session: Session, db: sqlite3.Cursor):
     def format_experiences(experiences):
         formatted_experiences = {}
         for user_id, average_emotion, username in experiences:
@@ -80,23 +67,43 @@ def send_teacher_report(client_socket: socket.socket, db: sqlite3.Cursor):
         formatted_experiences = format_experiences(experiences)
 
         teacher_report_json = json.dumps(formatted_experiences)
-        client_socket.sendall(f"TeacherReport:{teacher_report_json}\n".encode('utf-8'))
-        print(f"Sent Teacher Report: {teacher_report_json} to C# client.")
+        session.send(f"TeacherReport:{teacher_report_json}")
 
     except sqlite3.Error as e:
         print(f"Error fetching or sending teacher report: {e}")
 
-def authenticate_user(client_socket: socket.socket):
+def wait_for_recognition(session: Session, future):
+    """Waits for the recognition of one frame, returns None if the client left meanwhile"""
+    while True:
+        try:
+            return future.result(timeout=FACE_RECOGNITION_TIMEOUT)
+        except TimeoutError:
+            if not session.is_connected:
+                return None
+            print(f"face recognition is taking longer than {FACE_RECOGNITION_TIMEOUT} s, still waiting...")
+
+def authenticate_user(session: Session):
     recognized_username = None
     user_id, username, role = None, None, None
     
-    while not recognized_username:
-        _, image = cam.capture_image()
-        face_recognition_thread = ThreadWithReturn(target=detect_face, args=(image,))
-        face_recognition_thread.start()
-        result = face_recognition_thread.join()
+    while not recognized_username and session.is_connected:
+        # the session's authenticator is stateful, only one frame is recognized at a time
+        ret, image = session.frames.read()
+        if not ret:
+            # a failed read stops the camera, reopen it and retry with the next frame
+            print("Can't receive frame to authenticate, retrying...")
+            try:
+                cam.get_frame_source(session.frame_source)
+            except IOError as e:
+                print(f"Error reopening the camera: {e}")
+                time.sleep(1.0)
+            continue
+        face_recognition_future = workers.submit(authenticate_face, image, session.authenticator)
+        result = wait_for_recognition(session, face_recognition_future)
+        if result is None:
+            break
         
-        if "can't identify" not in result:
+        if not result.startswith("can't"):
             recognized_username = result
             print(f"Detected user: {recognized_username}")
         else:
@@ -105,7 +112,9 @@ def authenticate_user(client_socket: socket.socket):
             # new_user_name = register_new_user()
             # recognized_username = new_user_name
             # print(f"user: {new_user_name} has been registered successfully!!!")
-              
+    
+    if not recognized_username:
+        return None
 
     db, db_connection = connect_to_database()
     
@@ -124,13 +133,13 @@ def authenticate_user(client_socket: socket.socket):
 
             if recognized_username == name:
                 user_id, username, role = user_id, name, role
+                session.set_user(user_id, username, role)
                 
-                client_socket.send(f"Identity:{role}\n".encode('utf-8'))
+                session.send(f"Identity:{role}")
                 print(f"Authenticated via Bluetooth and Face Recognition: {name} ({role})")
-                print(f"Sent Identity: {role} to C# client.")
                 
                 if role == "Teacher":
-                    send_teacher_report(client_socket, db)
+                    send_teacher_report(session, db)
                 
                 if role == "Kid":
                     print(f"Kid ID: {user_id}")
@@ -141,38 +150,38 @@ def authenticate_user(client_socket: socket.socket):
             
         except Exception as e:
             print(f"Error processing authentication for {name}: {e}")
+    
+    db_connection.close()
 
-def recognize_emotions(frame):
-    emotion_detection_thread = ThreadWithReturn(target=detect_emotion, args=(frame,))
-    emotion_detection_thread.start()
-    detected_emotion = emotion_detection_thread.join()
+def store_detected_emotion(session: Session, result):
+    detected_emotion = result['dominant_emotion']
     print(f"Detected emotion: {detected_emotion}")
-    
-    if detected_emotion and detected_emotion in emotions:
-        emotion_buffer.append(detected_emotion)
+    session.emotion_aggregator.add(detected_emotion, result.get('emotion'))
+
+def save_emotion_bucket(session: Session, bucket):
+    # runs on the emotion model's thread, keep the database write off it
+    future = workers.submit(save_emotion_timeline_bucket, session.session_id, session.user_id, bucket)
+    future.add_done_callback(partial(report_failed_bucket_write, session, bucket))
+
+def report_failed_bucket_write(session: Session, bucket, future):
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Error saving minute {bucket['minute']} of the emotion timeline of session {session.session_id}: {future.exception()}")
         
-def recognize_and_send_animals(frame, client_socket: socket.socket):
-    yolo_results = yolo_model.predict(frame, conf=0.25, verbose=False)[0]
-    for detection in yolo_results.boxes:
-        cls_ = int(detection.cls[0])
-        label = yolo_model.names[cls_]
-        if label in animals:
-            bbox = detection.xyxy[0]
-            x1, y1, x2, y2 = map(int, bbox)
-            confidence = detection.conf[0]
-            # cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 0), 2)
-            # cv2.putText(frame, f"{label} ({confidence:.2f})", (x1, y1 - 10),
-            #             cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
-            try:
-                client_socket.send(f"Animal:{label}\n".encode('utf-8'))
-                print(f"Sent Animal: {label} to C# client.")
-                time.sleep(2.5)
-            except Exception as e:
-                print("Error sending object data to C# client:", e)
-                break
+def recognize_animals(session: Session, frame):
+    messages = []
+    for label, confidence, (x1, y1, x2, y2) in session.animal_detector.process(frame, session.grayscale.get(frame)):
+        # cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 0), 2)
+        # cv2.putText(frame, f"{label} ({confidence:.2f})", (x1, y1 - 10),
+        #             cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
+        messages.append(f"Animal:{label}")
+    
+    return None, messages
 
-def get_gaze_frame_and_save_looking_direction(frame):
-    gaze.refresh(frame)
+def get_gaze_frame_and_save_looking_direction(session: Session, frame):
+    gaze = session.gaze
+    gaze.refresh(frame, session.grayscale.get(frame))
+    # the emotion model reuses the face the gaze tracker just found instead of detecting it again
+    session.emotion_sampler.offer(frame, gaze.face_box)
     gaze_frame = gaze.annotated_frame()
     
     text = ""
@@ -194,121 +203,189 @@ def get_gaze_frame_and_save_looking_direction(frame):
     if left_pupil and right_pupil:
         average_x = (left_pupil[0] + right_pupil[0]) / 2
         average_y = (left_pupil[1] + right_pupil[1]) / 2
-        save_gaze_coordinates(text, average_x, average_y) 
+        session.gaze_recorder.record(text, average_x, average_y)
+        session.gaze_heatmap.add(average_x, average_y)
     
     return gaze_frame, text        
 
-def recognize_and_send_gestures(frame, mp_results, client_socket: socket.socket):
-    data_aux = []
-    x_ = []
-    y_ = []
+def recognize_gaze(session: Session, frame):
+    gaze_frame, looking_direction = get_gaze_frame_and_save_looking_direction(session, frame)
+    cv2.putText(gaze_frame, looking_direction, (90, 60), cv2.FONT_HERSHEY_DUPLEX, 1.6, (147, 58, 31), 2)
+    return gaze_frame, []
+
+def recognize_gestures(session: Session, frame):
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    mp_results = session.hands.process(rgb_frame)
+    probabilities = None
+    
+    if mp_results.multi_hand_landmarks:
+        probabilities = recognize_gestures_from_landmarks(session, rgb_frame, mp_results)
+    
+    # frames without a hand count as no gesture, the state machine decides when to send one
+    predicted_character = session.gesture_state.update(probabilities)
+    return rgb_frame, gesture_messages(predicted_character)
 
-    H, W, _ = frame.shape
+def recognize_gestures_from_landmarks(session: Session, frame, mp_results):
+    probabilities = None
 
     if mp_results.multi_hand_landmarks:
+        mp_solutions = models.get("mediapipe")
         for hand_landmarks in mp_results.multi_hand_landmarks:
-            mp_drawing.draw_landmarks(
+            mp_solutions.drawing_utils.draw_landmarks(
                 frame,
                 hand_landmarks,
-                mp_hands.HAND_CONNECTIONS,
-                mp_drawing_styles.get_default_hand_landmarks_style(),
-                mp_drawing_styles.get_default_hand_connections_style()
+                mp_solutions.hands.HAND_CONNECTIONS,
+                mp_solutions.drawing_styles.get_default_hand_landmarks_style(),
+                mp_solutions.drawing_styles.get_default_hand_connections_style()
             )
 
-        for hand_landmarks in mp_results.multi_hand_landmarks:
-            for i in range(len(hand_landmarks.landmark)):
-                x = hand_landmarks.landmark[i].x
-                y = hand_landmarks.landmark[i].y
+        features = session.gesture_features.extract(mp_results.multi_hand_landmarks)
+        model = models.get("gesture_classifier")
+        probabilities = model.predict_proba(features)[0]
+            
+    return probabilities
 
-                x_.append(x)
-                y_.append(y)
+def gesture_messages(predicted_character):
+    messages = []
+    
+    if predicted_character in ["Rotate", "Select", "Back"]:
+        messages.append(f"Gesture:{predicted_character}")
+        
+    elif predicted_character in ["Farm", "WildLife", "Home"]:
+        messages.append(f"Habitat:{predicted_character}")
+        
+    elif predicted_character in ["HappyKids", "SadKids", "NeutralKids", "AngryKids", "FearKids"]:
+        messages.append(f"ReportType:{predicted_character}")
+        
+    return messages
 
-            for i in range(len(hand_landmarks.landmark)):
-                x = hand_landmarks.landmark[i].x
-                y = hand_landmarks.landmark[i].y
-                data_aux.append(x - min(x_))
-                data_aux.append(y - min(y_))
+def publish_message(session: Session, message):
+    session.send(message, debounce=True)
 
-        prediction = model.predict([np.asarray(data_aux)])
-        predicted_character = labels_dict[int(prediction[0])]
+def build_pipeline(session: Session):
+    pipeline = FramePipeline(publish=partial(publish_message, session), queue_size=PIPELINE_QUEUE_SIZE,
+                             error_report_interval=PIPELINE_REPORT_INTERVAL)
+    pipeline.add_stage("gestures", partial(recognize_gestures, session))
+    
+    if session.role == "Kid":
+        pipeline.add_stage("gaze", partial(recognize_gaze, session))
+        pipeline.add_stage("animals", partial(recognize_animals, session))
         
-        if predicted_character in ["Rotate", "Select", "Back"]:
-            client_socket.send(f"Gesture:{predicted_character}\n".encode('utf-8'))
-            print(f"Sent Gesture: {predicted_character} to C# client.")
-            
-        elif predicted_character in ["Farm", "WildLife", "Home"]:
-            client_socket.send(f"Habitat:{predicted_character}\n".encode('utf-8'))
-            print(f"Sent Habitat: {predicted_character} to C# client.")
-            
-        elif predicted_character in ["HappyKids", "SadKids", "NeutralKids", "AngryKids", "FearKids"]:
-            client_socket.send(f"ReportType:{predicted_character}\n".encode('utf-8'))
-            print(f"Sent ReportType: {predicted_character} to C# client.")
-            
-    time.sleep(2)          
+    return pipeline
         
-def main_loop(client_socket: socket.socket, role):
-    cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
+def main_loop(session: Session):
+    cap = session.frames
+    pipeline = build_pipeline(session)
+    display_stage = "gaze" if session.role == "Kid" else "gestures"
+    window_name = f"Server Frame {session.session_id}"
+    pipeline.start()
+    last_report = time.perf_counter()
 
-    while cap.isOpened():
+    while session.is_connected:
         ret, frame = cap.read()
         if not ret:
             print("Can't receive frame (stream end?). Exiting...")
             break
 
         frame = cv2.resize(frame, (480, 320))
+        pipeline.submit(frame)
         
-        try:
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = hands.process(rgb_frame)
-
-            if results.multi_hand_landmarks:
-                recognize_and_send_gestures(rgb_frame, results, client_socket)
-            
-            if role == "Kid":
-                gaze_frame, looking_direction = get_gaze_frame_and_save_looking_direction(frame)    
-                recognize_and_send_animals(frame, client_socket)        
-                recognize_emotions(frame)
-                cv2.putText(gaze_frame, looking_direction, (90, 60), cv2.FONT_HERSHEY_DUPLEX, 1.6, (147, 58, 31), 2)
-                cv2.imshow("Server Frame", gaze_frame)
-            else:
-                cv2.imshow("Server Frame", rgb_frame)    
-
-        except Exception as e:
-            print(f"Error: {e}")
+        if time.perf_counter() - last_report >= PIPELINE_REPORT_INTERVAL:
+            print(f"Pipeline stats of session {session.session_id}: {pipeline.stats()}")
+            print(f"Hand tracking of session {session.session_id}: {session.hands.report()}")
+            last_report = time.perf_counter()
 
-        if cv2.waitKey(1) == ord('q'):
-            break
+        if SHOW_SERVER_FRAMES:
+            display_frame = pipeline.latest_frame(display_stage)
+            cv2.imshow(window_name, display_frame if display_frame is not None else frame)
+            if cv2.waitKey(1) == ord('q'):
+                break
 
-    cap.release()
-    cv2.destroyAllWindows()
+    pipeline.stop()
+    if SHOW_SERVER_FRAMES:
+        cv2.destroyWindow(window_name)
 
-def start_socket_server(host='localhost', port=5000):
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_socket.bind((host, port))
-    server_socket.listen(1)
-    print("Socket server started, waiting for connection...")
-    client_socket, address = server_socket.accept()
-    print(f"Connected to C# client at {address}")
-    return client_socket, server_socket
+def run_session(connection):
+    session = Session(connection)
+    if session.frames is None:
+        print(f"Turned away C# client {connection.address}: its frame source is used by another session, "
+              f"map the kiosk to its own camera in KIOSK_FRAME_SOURCES.")
+        return
+    
+    try:
+        serve_session(session)
+    finally:
+        session.close()
 
-def main_socket_thread():
-    initialize_gaze_coordinates_csv()
-    client_socket, server_socket = start_socket_server()
-    user_id, username, role = authenticate_user(client_socket)
-    set_proper_labels_according_to_user_role(role)
+def serve_session(session: Session):
+    print(f"Session {session.session_id} started for C# client {session.connection.address}")
+    
+    if authenticate_user(session) is None:
+        print(f"Session {session.session_id} ended before the user was authenticated.")
+        return
     
-    main_loop(client_socket, role)
+    if session.role == "Kid":
+        models.warm_up(KID_MODELS)
+        session.gaze = new_gaze_tracker()
+        calibration_file = os.path.join(CALIBRATIONS_DIR, f"{session.user_id}.json")
+        if session.gaze.calibration.load(calibration_file):
+            print(f"Loaded the gaze calibration of {session.username}, skipping the warm-up frames.")
+        session.emotion_aggregator = EmotionAggregator(emotions, bucket_seconds=EMOTION_BUCKET_SECONDS,
+                                                       timeline_length=EMOTION_TIMELINE_LENGTH,
+                                                       on_bucket=partial(save_emotion_bucket, session))
+        session.emotion_sampler = EmotionSampler(partial(store_detected_emotion, session),
+                                                 rate=EMOTION_SAMPLE_RATE, margin=EMOTION_FACE_MARGIN)
+        session.animal_detector = AnimalDetector(partial(inference.infer, "yolo"), models.get("yolo").names, animals,
+                                                 stride=ANIMAL_DETECTION_STRIDE, confidence=ANIMAL_DETECTION_CONFIDENCE,
+                                                 scene_change_threshold=ANIMAL_SCENE_CHANGE_THRESHOLD)
+    session.hands = new_hands_tracker()
+    gesture_classifier = models.get("gesture_classifier")
+    session.gesture_state = GestureStateMachine([session.labels_dict[int(label)] for label in gesture_classifier.classes_],
+                                                window=GESTURE_WINDOW, hold_duration=GESTURE_HOLD_SECONDS,
+                                                confidence_threshold=GESTURE_CONFIDENCE_THRESHOLD)
+    session.gaze_recorder = GazeRecorder(session.output_file(CSV_FILE), session.output_file(GAZE_SAMPLES_FILE),
+                                         session_id=session.session_id, user_id=session.user_id).start()
     
-    if role == "Kid":
-        print(f"saving to db average emotion of {Counter(emotion_buffer).most_common(1)[0][0]} for the user: {username}, with role of {role} ....")
-        save_user_average_emotion_to_database(user_id, Counter(emotion_buffer).most_common(1)[0][0])
+    main_loop(session)
+    print(f"Hand tracking of session {session.session_id}: {session.hands.report()}")
+    session.hands.close()
+    session.gaze_recorder.close()
+    print(f"Recorded {session.gaze_recorder.recorded} gaze samples in {session.gaze_recorder.writes} writes.")
+    
+    if session.role == "Kid":
+        user_id, username, role = session.user_id, session.username, session.role
+        # the last crop may still be on the emotion model, let it reach the aggregator first
+        if not session.emotion_sampler.drain(timeout=FACE_RECOGNITION_TIMEOUT):
+            print(f"The last emotion of session {session.session_id} did not arrive in time, closing without it.")
+        emotion_summary = session.emotion_aggregator.close()
+        if emotion_summary["dominant"] is not None:
+            print(f"saving to db average emotion of {emotion_summary['dominant']} for the user: {username}, with role of {role} ....")
+            save_user_average_emotion_to_database(user_id, emotion_summary["dominant"], emotion_summary["distribution"],
+                                                  emotion_summary["timeline"], session.session_id)
+        else:
+            print(f"No emotion was detected for the user: {username}, nothing saved.")
+        if session.gaze.calibration.is_complete():
+            session.gaze.calibration.save(calibration_file)
+        print(f"Animal detection of session {session.session_id}: {session.animal_detector.report()}")
+        print(f"Emotion sampling of session {session.session_id}: {session.emotion_sampler.report()}")
         print("Generating heatmap for gaze data...")
-        generate_heatmap(CSV_FILE)
-        
-    client_socket.close()
-    server_socket.close()
-    print("Socket server closed.")
+        session.gaze_heatmap.snapshot(session.output_file(HEATMAP_FILE), force=True)
+    
+    print(f"Session {session.session_id} closed.")
+
+def main():
+    migrate_database()
+    # gesture models are used by every role, load them while waiting for the C# clients
+    models.warm_up(AUTHENTICATION_MODELS + TEACHER_MODELS)
+    server = HabitatServer(run_session, SERVER_HOST, SERVER_PORT, max_sessions=MAX_SESSIONS,
+                           queue_size=CLIENT_QUEUE_SIZE, send_timeout=CLIENT_SEND_TIMEOUT)
+    server.run()
+    
+    inference.stop()
+    cam.release()
+    workers.shutdown()
+    print(f"Model load times (s): {models.report()}")
+    print(f"Inference throughput: {inference.report()}")
 
 if __name__ == "__main__":
-    thread = Thread(target=main_socket_thread)
-    thread.start()
+    main()
@@ -0,0 +1,61 @@
+import time
+from rich import print
+from threading import Thread, Lock
+
+
+class ModelRegistry(object):
+    """
+    This class loads models lazily: a model is built by its loader the first
+    time it is requested, once, even when several threads ask for it at the
+    same time. Models can also be warmed up in the background.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._locks = {}
+        self.load_times = {}
+
+    def register(self, name, loader):
+        """Registers a zero-argument loader under name"""
+        self._loaders[name] = loader
+        self._locks[name] = Lock()
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def get(self, name):
+        """Returns the model, loading it on first use"""
+        try:
+            return self._models[name]
+        except KeyError:
+            pass
+
+        with self._locks[name]:
+            if name not in self._models:
+                start = time.perf_counter()
+                self._models[name] = self._loaders[name]()
+                self.load_times[name] = time.perf_counter() - start
+                print(f"Loaded model {name} in {self.load_times[name]:.2f} s")
+        return self._models[name]
+
+    def warm_up(self, names, background=True):
+        """Loads the given models, on a daemon thread when background is set"""
+        def load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"Error warming up model {name}: {e}")
+
+        if not background:
+            load_all()
+            return None
+
+        thread = Thread(target=load_all, name="model-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def report(self):
+        """Returns the load time in seconds of every loaded model"""
+        return {name: round(seconds, 3) for name, seconds in self.load_times.items()}
@@ -0,0 +1,212 @@
+import time
+import queue
+from rich import print
+from threading import Thread, Event, Lock
+
+
+class StageStats(object):
+    """
+    This class keeps the counters of a single pipeline stage
+    (processed frames, dropped frames, analyzer errors and processing time)
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy_time = 0.0
+        self._window_start = time.perf_counter()
+        self._window_count = 0
+        self.fps = 0.0
+
+    def record(self, elapsed):
+        """Records one processed frame that took `elapsed` seconds"""
+        with self._lock:
+            self.processed += 1
+            self.busy_time += elapsed
+            self._window_count += 1
+            now = time.perf_counter()
+            window = now - self._window_start
+            if window >= 1.0:
+                self.fps = self._window_count / window
+                self._window_start = now
+                self._window_count = 0
+
+    def record_drop(self):
+        """Records one frame that was dropped before being processed"""
+        with self._lock:
+            self.dropped += 1
+
+    def record_error(self):
+        """Records one frame the analyzer raised on"""
+        with self._lock:
+            self.errors += 1
+
+
+class LatestFrameQueue(object):
+    """
+    Bounded queue that never blocks the producer: when it is full the
+    oldest frame is discarded so workers always see the freshest frames.
+    """
+
+    def __init__(self, maxsize=1):
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, item):
+        """Puts an item, returns True if an older item had to be dropped"""
+        dropped = False
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return dropped
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    dropped = True
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        return self._queue.get(timeout=timeout)
+
+    def depth(self):
+        return self._queue.qsize()
+
+
+class Stage(Thread):
+    """
+    A pipeline worker that runs one analyzer on the frames of its own queue.
+
+    The analyzer is called as `analyzer(frame)` and must return a tuple
+    `(display_frame, messages)` where `display_frame` may be None and
+    `messages` is an iterable of outbound protocol lines (e.g. "Animal:cat").
+    """
+
+    def __init__(self, name, analyzer, results, stop_event, queue_size=1, error_report_interval=10.0):
+        super().__init__(name=f"stage-{name}", daemon=True)
+        self.stage_name = name
+        self.analyzer = analyzer
+        self.frames = LatestFrameQueue(queue_size)
+        self.stats = StageStats()
+        self.error_report_interval = error_report_interval
+        self._results = results
+        self._stop_event = stop_event
+        self._last_error_report = None
+        self._unreported_errors = 0
+
+    def submit(self, frame_id, frame):
+        if self.frames.put((frame_id, frame)):
+            self.stats.record_drop()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                frame_id, frame = self.frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            start = time.perf_counter()
+            try:
+                display_frame, messages = self.analyzer(frame)
+            except Exception as e:
+                self.stats.record_error()
+                self._report_error(e)
+                continue
+            self.stats.record(time.perf_counter() - start)
+
+            self._results.put((self.stage_name, frame_id, display_frame, list(messages or [])))
+
+    def _report_error(self, error):
+        """Prints the first error, then at most one summary every error_report_interval seconds,
+        so an analyzer failing on every frame does not flood the log at camera rate"""
+        now = time.perf_counter()
+        self._unreported_errors += 1
+        if self._last_error_report is None:
+            print(f"Error in {self.stage_name} stage: {error}")
+        elif now - self._last_error_report >= self.error_report_interval:
+            print(f"{self._unreported_errors} errors in {self.stage_name} stage since the last report, latest: {error}")
+        else:
+            return
+        self._last_error_report = now
+        self._unreported_errors = 0
+
+
+class FramePipeline(object):
+    """
+    This class fans captured frames out to one worker per analyzer and
+    merges their results on a single publisher thread, so a slow model
+    only delays its own results instead of the whole frame loop.
+    """
+
+    def __init__(self, publish, queue_size=1, error_report_interval=10.0):
+        self.publish = publish
+        self.queue_size = queue_size
+        self.error_report_interval = error_report_interval
+        self.stages = {}
+        self.capture_stats = StageStats()
+        self._results = queue.Queue()
+        self._stop_event = Event()
+        self._merger = Thread(target=self._merge_results, name="stage-merger", daemon=True)
+        self._latest_frames = {}
+        self._latest_lock = Lock()
+        self._frame_id = 0
+
+    def add_stage(self, name, analyzer):
+        """Registers an analyzer, must be called before start()"""
+        self.stages[name] = Stage(name, analyzer, self._results, self._stop_event, self.queue_size,
+                                  self.error_report_interval)
+
+    def start(self):
+        for stage in self.stages.values():
+            stage.start()
+        self._merger.start()
+
+    def submit(self, frame):
+        """Hands a captured frame to every stage without blocking"""
+        start = time.perf_counter()
+        self._frame_id += 1
+        for stage in self.stages.values():
+            stage.submit(self._frame_id, frame)
+        self.capture_stats.record(time.perf_counter() - start)
+
+    def latest_frame(self, name):
+        """Returns the last display frame produced by the given stage"""
+        with self._latest_lock:
+            return self._latest_frames.get(name)
+
+    def _merge_results(self):
+        while not self._stop_event.is_set() or not self._results.empty():
+            try:
+                name, frame_id, display_frame, messages = self._results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            if display_frame is not None:
+                with self._latest_lock:
+                    self._latest_frames[name] = display_frame
+
+            for message in messages:
+                try:
+                    self.publish(message)
+                except Exception as e:
+                    print(f"Error publishing {message!r} from {name} stage: {e}")
+
+    def stats(self):
+        """Returns the per-stage fps, queue depth, drop and error counters"""
+        report = {"capture": {"fps": round(self.capture_stats.fps, 1)}}
+        for name, stage in self.stages.items():
+            report[name] = {
+                "fps": round(stage.stats.fps, 1),
+                "queue_depth": stage.frames.depth(),
+                "processed": stage.stats.processed,
+                "dropped": stage.stats.dropped,
+                "errors": stage.stats.errors,
+            }
+        return report
+
+    def stop(self):
+        self._stop_event.set()
+        for stage in self.stages.values():
+            stage.join()
+        self._merger.join()
@@ -1,13 +1,15 @@
-import face_recognition
 import numpy as np
 import cam
 import os
+from constants import models
 
 
 def read_encodings(csv_dir: str):
     encodings = {}
     for path, folders, files in os.walk(csv_dir):
         for filename in files:
+            if not filename.endswith(".csv"):
+                continue
             name = filename.split(".")[0]
             encodings[name] = []
             with open(os.path.join(csv_dir, filename)) as file:
@@ -25,17 +27,27 @@ def determine_whos_in_the_pic(comparison_results) -> bool:
     return False
 
 
-def recognize_face(image,encodings)-> str:
+def encode_unknown_face(image):
     """
-        takes in image and encodings, returns who is in the picture
+        takes in image, returns the encoding of the first face found or None
     """
+    face_recognition = models.get("face_recognition")
     image_locations = face_recognition.face_locations(image)
     unknown_encoding = face_recognition.face_encodings(image,image_locations)
     if len(unknown_encoding)<=0:
-        return "can't find faces in provided picture"
+        return None
+    return unknown_encoding[0]
+
 
-    unknown_encoding = unknown_encoding[0]
+def recognize_face(image,encodings)-> str:
+    """
+        takes in image and encodings, returns who is in the picture
+    """
+    unknown_encoding = encode_unknown_face(image)
+    if unknown_encoding is None:
+        return "can't find faces in provided picture"
 
+    face_recognition = models.get("face_recognition")
     for name in encodings:
         results = face_recognition.compare_faces(encodings[name], unknown_encoding, tolerance=0.5)
         acceptance = determine_whos_in_the_pic(results)
@@ -44,6 +56,19 @@ def recognize_face(image,encodings)-> str:
     return "can't identify the person in the picture"
 
 
+def recognize_face_in_index(image,index)-> str:
+    """
+        takes in image and a FaceIndex, returns who is in the picture
+    """
+    unknown_encoding = encode_unknown_face(image)
+    if unknown_encoding is None:
+        return "can't find faces in provided picture"
+
+    name = index.match(unknown_encoding, tolerance=0.5, acceptance=0.75)
+    if name is None:
+        return "can't identify the person in the picture"
+    return f"{name}"
+
 
 if __name__ == "__main__":
     _, image = cam.capture_image()
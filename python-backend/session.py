@@ -0,0 +1,79 @@
+import os
+import time
+import itertools
+from rich import print
+from event_scheduler import EventDebouncer
+from gesture_features import LandmarkFeatures
+from frame_source import GrayscaleCache
+from heatmap import HeatmapAccumulator
+from authenticator import FaceAuthenticator
+from face_recognization_funcs import face_index
+from constants import (
+    SESSIONS_DIR, HEATMAP_BINS, HEATMAP_RENDER_INTERVAL, EVENT_COOLDOWNS, DEFAULT_EVENT_COOLDOWN,
+    labels_dict_kid, labels_dict_teacher, KIOSK_FRAME_SOURCES,
+)
+import cam
+
+_session_ids = itertools.count(int(time.time() * 1000))
+
+
+class Session(object):
+    """
+    Everything that belongs to one connected kiosk: the authenticated user,
+    its own frame subscription, trackers, recorders and outbound debouncer.
+    Nothing here is shared with the other sessions served at the same time.
+    """
+
+    def __init__(self, connection):
+        self.session_id = next(_session_ids)
+        self.connection = connection
+        self.user_id = None
+        self.username = None
+        self.role = None
+        self.labels_dict = None
+
+        # each kiosk needs its own camera, frames is None when this one is already in use
+        self.frame_source = KIOSK_FRAME_SOURCES.get(connection.address[0] if connection.address else None)
+        self.frames = cam.claim_frame_source(self.frame_source)
+        self.grayscale = GrayscaleCache()
+        self.authenticator = FaceAuthenticator(face_index, window=5, min_votes=3)
+        self.debouncer = EventDebouncer(EVENT_COOLDOWNS, default_cooldown=DEFAULT_EVENT_COOLDOWN)
+
+        self.hands = None
+        self.gesture_features = LandmarkFeatures(max_hands=1)
+        self.gesture_state = None
+        self.gaze = None
+        self.animal_detector = None
+        self.gaze_recorder = None
+        self.gaze_heatmap = HeatmapAccumulator(width=480, height=320, bins=HEATMAP_BINS, min_render_interval=HEATMAP_RENDER_INTERVAL)
+        self.emotion_aggregator = None
+        self.emotion_sampler = None
+
+    @property
+    def is_connected(self):
+        return not self.connection.closed.is_set()
+
+    def close(self):
+        """Frees the frame source for the next session"""
+        if self.frames is not None:
+            cam.unclaim_frame_source(self.frame_source)
+            self.frames = None
+
+    def set_user(self, user_id, username, role):
+        self.user_id, self.username, self.role = user_id, username, role
+        self.labels_dict = labels_dict_kid if role == "Kid" else labels_dict_teacher
+
+    def output_file(self, filename):
+        """Returns the path of a file in this session's own output folder"""
+        directory = os.path.join(SESSIONS_DIR, str(self.session_id))
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, filename)
+
+    def send(self, message, debounce=False):
+        """Sends one "Kind:value" line, returns False if the debouncer suppressed it"""
+        if debounce and not self.debouncer.should_emit(message):
+            return False
+
+        self.connection.send(message)
+        print(f"Sent {message} to C# client {self.connection.address}.")
+        return True
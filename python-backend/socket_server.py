@@ -0,0 +1,137 @@
+import asyncio
+from rich import print
+from threading import Event
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+
+def format_message(message):
+    """Frames one "Kind:value" message as a line of the protocol read by Form1.cs with ReadLine"""
+    if "\n" in message or "\r" in message:
+        raise ValueError(f"message must fit on a single line: {message!r}")
+    return message + "\n"
+
+
+class ClientConnection(object):
+    """
+    One connected HabitatSimulator client.
+
+    Session threads call send(); lines go through a bounded per-client asyncio
+    queue that a writer task drains with non-blocking writes. When the client
+    stops reading, the queue fills up and send() makes the caller wait
+    (backpressure) instead of growing memory without bound.
+    """
+
+    def __init__(self, reader, writer, loop, queue_size=256, send_timeout=5.0):
+        self.reader = reader
+        self.writer = writer
+        self.loop = loop
+        self.send_timeout = send_timeout
+        self.address = writer.get_extra_info("peername")
+        self.outbound = asyncio.Queue(maxsize=queue_size)
+        self.closed = Event()
+        self.sent = 0
+
+    def send(self, message):
+        """Thread-safe: queues one protocol line (without the trailing newline) for the client"""
+        if self.closed.is_set():
+            raise ConnectionError(f"client {self.address} disconnected")
+
+        line = format_message(message)
+        future = asyncio.run_coroutine_threadsafe(self.outbound.put(line), self.loop)
+        try:
+            future.result(timeout=self.send_timeout)
+        except TimeoutError:
+            future.cancel()
+            raise ConnectionError(f"client {self.address} is not reading, dropped {message!r}")
+
+    async def write_loop(self):
+        try:
+            while True:
+                line = await self.outbound.get()
+                if line is None:
+                    break
+                self.writer.write(line.encode('utf-8'))
+                await self.writer.drain()
+                self.sent += 1
+        except (ConnectionError, OSError) as e:
+            print(f"Error writing to C# client {self.address}: {e}")
+        finally:
+            self.closed.set()
+
+    async def read_loop(self):
+        """The C# client only listens; reading is used to notice when it goes away"""
+        try:
+            while await self.reader.readline():
+                pass
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.closed.set()
+
+    async def close(self):
+        self.closed.set()
+        try:
+            # let already queued lines go out before the writer stops
+            await asyncio.wait_for(self.outbound.put(None), timeout=self.send_timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class HabitatServer(object):
+    """
+    asyncio socket server accepting many HabitatSimulator clients at once.
+    Every client gets its own ClientConnection and its session handler
+    (a blocking function taking the connection) runs on its own thread.
+    """
+
+    def __init__(self, session_handler, host='localhost', port=5000, max_sessions=32,
+                 queue_size=256, send_timeout=5.0):
+        self.session_handler = session_handler
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.connections = set()
+        self._sessions = ThreadPoolExecutor(max_workers=max_sessions, thread_name_prefix="session")
+
+    async def _handle_client(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        connection = ClientConnection(reader, writer, loop, self.queue_size, self.send_timeout)
+        self.connections.add(connection)
+        print(f"Connected to C# client at {connection.address} ({len(self.connections)} connected)")
+
+        writer_task = asyncio.create_task(connection.write_loop())
+        reader_task = asyncio.create_task(connection.read_loop())
+        try:
+            await loop.run_in_executor(self._sessions, self.session_handler, connection)
+        except Exception as e:
+            print(f"Error in session of {connection.address}: {e}")
+        finally:
+            await connection.close()
+            try:
+                await asyncio.wait_for(writer_task, timeout=self.send_timeout)
+            except asyncio.TimeoutError:
+                pass
+            reader_task.cancel()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+            self.connections.discard(connection)
+            print(f"C# client {connection.address} disconnected ({len(self.connections)} connected)")
+
+    async def serve(self):
+        server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        print(f"Socket server started on {self.host}:{self.port}, waiting for connections...")
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._sessions.shutdown(wait=False, cancel_futures=True)
+            print("Socket server closed.")
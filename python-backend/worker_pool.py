@@ -0,0 +1,68 @@
+import os
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError
+
+
+class WorkerPool(object):
+    """
+    Long-lived executor service shared by the server.
+
+    Threads are used for native models that release the GIL (dlib, TensorFlow,
+    OpenCV), processes for pure-Python CPU work. Both pools are created lazily
+    and reused for the lifetime of the server.
+    """
+
+    def __init__(self, max_threads=4, max_processes=None):
+        self.max_threads = max_threads
+        self.max_processes = max_processes or max(1, (os.cpu_count() or 2) - 1)
+        self._threads = None
+        self._processes = None
+        self._lock = Lock()
+
+    def _thread_pool(self):
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix="worker")
+            return self._threads
+
+    def _process_pool(self):
+        with self._lock:
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(max_workers=self.max_processes)
+            return self._processes
+
+    def submit(self, fn, *args, **kwargs):
+        """Runs fn on the thread pool and returns a concurrent.futures.Future"""
+        return self._thread_pool().submit(fn, *args, **kwargs)
+
+    def submit_process(self, fn, *args, **kwargs):
+        """Runs fn on the process pool, fn and its arguments must be picklable"""
+        return self._process_pool().submit(fn, *args, **kwargs)
+
+    def map_process(self, fn, iterable, chunksize=1):
+        """Maps fn over iterable on the process pool, results keep the input order"""
+        return self._process_pool().map(fn, iterable, chunksize=chunksize)
+
+    def run(self, fn, *args, timeout=None, **kwargs):
+        """Runs fn on the thread pool and waits for its result.
+
+        Raises concurrent.futures.TimeoutError if it does not finish in time;
+        the task is cancelled if it has not started yet.
+        """
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            for pool in (self._threads, self._processes):
+                if pool is not None:
+                    pool.shutdown(wait=wait, cancel_futures=True)
+            self._threads = None
+            self._processes = None
+
+
+workers = WorkerPool()